@@ -1,15 +1,27 @@
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, PlainTextResponse
 import asyncio
-import json
+import time
 from fastapi.middleware.cors import CORSMiddleware
-from inference import predict
-from training import trigger_training
-from drift import run_drift_check
-from load_from_registry import load_latest_model
-import pandas as pd
+from inference import predict, predict_batch, encode_row
+from schema import PredictRequest
+from prediction_logger import log_prediction, prediction_log, query_predictions, latest_since
+import csv_log
+from events import broadcaster, HEARTBEAT_S
+from batcher import MicroBatcher
+from prediction_cache import PredictionCache
+from training import TrainingScheduler
+from executors import PoolSaturated, inference_pool, drift_pool
+from drift import run_drift_check, get_tracker, get_reference_profile, has_reference, report_job, REPORT_FILE
+from features import FEATURES
+from incremental import LABEL, OBSERVATIONS_FILE
+from load_from_registry import fetch_latest_model
+from model_registry import ModelRegistry
+from metrics import metrics, stage_seconds
 import os
 from datetime import datetime
+from typing import Dict, List, Optional, Union
+from fastapi.encoders import jsonable_encoder
 
 app = FastAPI(title="Diabetes Prediction MLOps API")
 
@@ -20,105 +32,337 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+# set by serve.py when this module is imported once and forked into several workers
+WORKERS = int(os.environ.get("SERVE_WORKERS", "1"))
+EVENTS_POLL_S = float(os.environ.get("EVENTS_POLL_S", "0.5"))
+
 print("Loading production model at startup...")
-model = load_latest_model()
+# install only: the registry below does the one joblib load
+fetch_latest_model()
+registry = ModelRegistry()
+registry.refresh()
+if has_reference():
+    get_reference_profile(registry.active().version)
+
+# repeated feature vectors skip the model; any hot swap empties the cache
+prediction_cache = PredictionCache()
+registry.swap_listeners.append(prediction_cache.clear)
+
+# every logged prediction is pushed to /events subscribers
+if WORKERS == 1:
+    prediction_log.append_listeners.append(broadcaster.publish)
+
+
+async def relay_events():
+    """Publish predictions logged by any worker, as they land in the shared database."""
+    _, last_id = await asyncio.to_thread(latest_since)
+    while True:
+        await asyncio.sleep(EVENTS_POLL_S)
+        try:
+            row, last_id = await asyncio.to_thread(latest_since, last_id)
+        except Exception as exc:
+            print(f"event relay failed: {exc}")
+            continue
+        if row is not None:
+            broadcaster.publish(row)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # threads do not survive a fork, so they start here, once per worker
+    registry.start_watcher()
+    if WORKERS > 1:
+        asyncio.create_task(relay_events())
+
+
+@app.on_event("shutdown")
+def flush_prediction_log():
+    # forked workers leave via os._exit, which skips the atexit flush
+    prediction_log.flush()
+
+http_requests = metrics.counter(
+    "http_requests_total", "Requests handled, by route and status code.", ("method", "route", "status"))
+http_seconds = metrics.histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route.", ("method", "route"))
+
+
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # the route template, not the raw path, keeps label cardinality bounded
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    http_seconds.observe(time.perf_counter() - started, request.method, path)
+    http_requests.inc(request.method, path, response.status_code)
+    return response
+
+
+def resolve_model(name=None, version=None):
+    try:
+        return registry.get(name, version)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail=exc.args[0])
 
 @app.get("/health")
 def health():
+    entry = registry.active()
     return {
         "status": "ok",
         "model_loaded": True,
-        "model_type": type(model).__name__
+        "model_type": type(entry.model).__name__,
+        "model_version": entry.version
     }
 
+@app.get("/models")
+def list_models():
+    return registry.list()
+
+@app.post("/models/reload")
+def reload_models():
+    """Pick up new artifacts now instead of waiting for the watcher."""
+    return {"swapped": registry.refresh(), **registry.list()}
+
+@app.post("/models/active")
+def set_active_model(name: str):
+    resolve_model(name)
+    registry.set_active(name)
+    return registry.list()
+
+def log_training(action, detail=None):
+    # blocking (locked file append): call it off the event loop
+    csv_log.append_row("training_log.csv", {"timestamp": datetime.utcnow(), "action": action, "detail": detail})
+
+training_scheduler = TrainingScheduler(on_result=log_training)
+
 @app.post("/train")
-def train():
+async def train():
+    """Queue an Airflow DAG trigger; retries happen in the background."""
     # log training request
-    log_file = "training_log.csv"
-    row = {"timestamp": datetime.utcnow(), "action": "triggered"}
-    df = pd.DataFrame([row])
-    if not os.path.exists(log_file):
-        df.to_csv(log_file, index=False)
-    else:
-        df.to_csv(log_file, mode="a", header=False, index=False)
-
-    trigger_training()
+    await asyncio.to_thread(log_training, "triggered")
+    training_scheduler.schedule()
     return {"status": "Training started"}
 
+@app.exception_handler(PoolSaturated)
+async def pool_saturated(request, exc):
+    return JSONResponse(status_code=503, content={"error": str(exc)})
+
+@app.get("/executors")
+def executor_stats():
+    """Concurrency limits and queue depths for each kind of work."""
+    return {
+        "inference": inference_pool.stats(),
+        "drift": drift_pool.stats(),
+        "training_trigger": training_scheduler.stats(),
+    }
+
+MICROBATCH_ENABLED = os.environ.get("MICROBATCH_ENABLED", "1") == "1"
+batchers = {}
+
+def batcher_for(entry):
+    """One micro-batcher per model version, so a batch never mixes models."""
+    b = batchers.get(entry.version)
+    if b is None:
+        predictor = entry.predictor
+        b = batchers[entry.version] = MicroBatcher(
+            lambda x: predictor.predict(x).astype(int).tolist(), len(FEATURES), pool=inference_pool
+        )
+        loaded = {e["version"] for e in registry.list()["versions"]}
+        for v in [v for v in batchers if v not in loaded and v != entry.version]:
+            # ends the evicted batcher's worker task after its queued rows are scored
+            batchers.pop(v).close()
+    return b
+
 @app.post("/predict")
-def inference_endpoint(data: dict):
-    return predict(data, model)
+async def inference_endpoint(data: PredictRequest, model: Optional[str] = None, version: Optional[str] = None):
+    """Score one record, sent either as named features or as {"features": [...]}.
+
+    `model` or `version` pin a specific loaded model.
+    """
+    entry = resolve_model(model, version)
+    with stage_seconds.time("predict", "parse"):
+        try:
+            row = encode_row(data.row(), entry.encoder)
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=str(exc))
+        record = dict(zip(FEATURES, row))
+    with stage_seconds.time("predict", "cache"):
+        pred = prediction_cache.get(entry.version, row)
+    if pred is not None:
+        log_prediction(record, pred)
+        return {"prediction": pred, "model_version": entry.version, "cached": True}
+    if not MICROBATCH_ENABLED:
+        result = await inference_pool.run(predict, record, entry.predictor)
+        prediction_cache.put(entry.version, row, result["prediction"])
+        return {**result, "model_version": entry.version}
+    # queue wait plus the batched model call; /predict/stats splits the two
+    with stage_seconds.time("predict", "model"):
+        pred = await batcher_for(entry).submit(row)
+    prediction_cache.put(entry.version, row, pred)
+    log_prediction(record, pred)
+    return {"prediction": pred, "model_version": entry.version}
+
+@app.get("/predict/stats")
+def batcher_stats():
+    return {version: b.snapshot() for version, b in batchers.items()}
+
+@app.get("/predict/cache")
+def cache_stats():
+    return prediction_cache.stats()
+
+@app.post("/predict/batch")
+async def batch_inference_endpoint(data: Union[List[dict], Dict[str, list]],
+                             model: Optional[str] = None, version: Optional[str] = None):
+    """Score many records in one call.
+
+    Accepts either a JSON array of records or a dict of equal-length
+    column arrays keyed by feature name. Categorical features may be sent
+    as categories ("Male") or codes.
+    """
+    entry = resolve_model(model, version)
+    try:
+        result = await inference_pool.run(predict_batch, data, entry.predictor, entry.encoder)
+        return {**result, "model_version": entry.version}
+    except KeyError as exc:
+        raise HTTPException(status_code=422, detail=f"missing feature: {exc.args[0]}")
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
 
 @app.get("/drift")
-def drift():
-    return run_drift_check()
+def drift(window: str = "all"):
+    """Mean-shift drift check. `window` is "all" or "recent" (sliding window)."""
+    return run_drift_check(window=window, model_version=registry.active().version)
+
+@app.get("/drift/stats")
+def drift_stats(window: str = "all"):
+    return get_tracker(registry.active().version).stats(window).to_dict(FEATURES)
+
+
+def paginated(rows, next_cursor):
+    """Return rows as a plain JSON list; the cursor for the next page goes in a header."""
+    headers = {} if next_cursor is None else {"X-Next-Cursor": str(next_cursor)}
+    return JSONResponse(content=jsonable_encoder(rows), headers=headers)
+
+
+def read_csv_log(f, limit, cursor, since, until):
+    limit = min(limit, MAX_PAGE_SIZE)
+    if cursor is None and since is not None:
+        cursor = csv_log.seek_time(f, since)
+    if cursor is not None:
+        return csv_log.page(f, cursor, limit, until)
+    return csv_log.tail(f, limit, until)
 
 
 @app.get('/drift_log')
-def drift_log():
+def drift_log(limit: int = PAGE_SIZE, cursor: Optional[int] = None,
+              since: Optional[str] = None, until: Optional[str] = None):
+    """Drift checks, oldest first. Without cursor/since, returns the last `limit` rows."""
     f = 'drift_log.csv'
     if not os.path.exists(f):
         return {'log': []}
-    df = pd.read_csv(f)
-    return df.to_dict(orient='records')
+    return paginated(*read_csv_log(f, limit, cursor, since, until))
 
 
 @app.post('/observe')
 def observe(data: dict):
     """Accept observed feature vectors (synthetic or real) and append to observations file."""
-    file = 'observations.csv'
-    df = pd.DataFrame([data])
-    if not os.path.exists(file):
-        df.to_csv(file, index=False)
-    else:
-        df.to_csv(file, mode='a', header=False, index=False)
+    # fixed columns, so the header never depends on whichever body came first
+    csv_log.append_row(OBSERVATIONS_FILE, data, columns=FEATURES + [LABEL])
     return {'status': 'observed'}
 
 
 @app.get('/recent')
-def recent_predictions():
-    f = 'recent_predictions.csv'
-    if not os.path.exists(f):
+def recent_predictions(limit: int = PAGE_SIZE, cursor: Optional[int] = None,
+                       since: Optional[str] = None, until: Optional[str] = None):
+    """Logged predictions, oldest first. Without cursor/since, returns the last `limit` rows."""
+    rows, next_cursor = query_predictions(min(limit, MAX_PAGE_SIZE), cursor, since, until)
+    if not rows and cursor is None and since is None:
         return {'error': 'no recent predictions'}
-    df = pd.read_csv(f)
-    return df.to_dict(orient='records')
+    return paginated(rows, next_cursor)
 
 
 @app.get('/events')
 async def events():
     async def event_stream():
-        last_ts = None
-        while True:
-            try:
-                if os.path.exists('recent_predictions.csv'):
-                    df = pd.read_csv('recent_predictions.csv')
-                    if not df.empty:
-                        last_row = df.iloc[-1]
-                        ts = str(last_row['timestamp'])
-                        if ts != last_ts:
-                            last_ts = ts
-                            data = last_row.to_dict()
-                            yield f"data: {json.dumps(data, default=str)}\n\n"
-            except Exception:
-                pass
-            await asyncio.sleep(1)
+        async with broadcaster.subscribe() as sub:
+            while True:
+                try:
+                    message = await asyncio.wait_for(sub.get(), HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"data: {message}\n\n"
     return StreamingResponse(event_stream(), media_type='text/event-stream')
 
 
+@app.get('/events/stats')
+def events_stats():
+    return broadcaster.stats()
+
+
 @app.get('/training_log')
-def training_log():
+def training_log(limit: int = PAGE_SIZE, cursor: Optional[int] = None,
+                 since: Optional[str] = None, until: Optional[str] = None):
     f = 'training_log.csv'
     if not os.path.exists(f):
         return []
-    df = pd.read_csv(f)
-    return df.to_dict(orient='records')
+    return paginated(*read_csv_log(f, limit, cursor, since, until))
 
 
 @app.get('/drift_report')
 def serve_drift_report():
-    path = 'drift_report.html'
+    """Serve the most recently completed report; rendering happens in the background."""
+    path = REPORT_FILE
     if not os.path.exists(path):
-        return {"error": "drift report not found"}
-    return FileResponse(path, media_type='text/html', filename='drift_report.html')
\ No newline at end of file
+        return {"error": "drift report not found", "status": report_job.status()}
+    generated_at = report_job.last_completed or datetime.utcfromtimestamp(os.path.getmtime(path)).isoformat()
+    return FileResponse(
+        path,
+        media_type='text/html',
+        filename='drift_report.html',
+        headers={"X-Report-Generated-At": generated_at},
+    )
+
+
+@app.get('/drift_report/status')
+def drift_report_status():
+    return report_job.status()
+
+
+metrics.gauges("model_info", "Loaded model versions; 1 for the active one, 0 otherwise.",
+               ("name", "version", "model_type"),
+               lambda: [((e["name"], e["version"], e["model_type"]), int(e["version"] == registry.active().version))
+                        for e in registry.list()["versions"]])
+metrics.gauges("executor_in_flight", "Tasks running or queued on each executor pool.", ("pool",),
+               lambda: [(("inference",), inference_pool.in_flight), (("drift",), drift_pool.in_flight)])
+metrics.gauges("executor_rejected_total", "Tasks refused because a pool was saturated.", ("pool",),
+               lambda: [(("inference",), inference_pool.rejected), (("drift",), drift_pool.rejected)],
+               kind="counter")
+metrics.gauges("microbatch_queue_depth", "Rows waiting for a micro-batch, by model version.", ("version",),
+               lambda: [((v,), b.snapshot()["queue_depth"]) for v, b in list(batchers.items())])
+metrics.gauges("prediction_log_pending", "Predictions buffered in memory, not yet written.", (),
+               lambda: [((), prediction_log.pending())])
+metrics.gauges("prediction_log_dropped_total", "Predictions dropped because the buffer overflowed.", (),
+               lambda: [((), prediction_log.dropped)], kind="counter")
+metrics.gauges("prediction_cache_lookups_total", "Prediction cache lookups, by result.", ("result",),
+               lambda: [(("hit",), prediction_cache.hits), (("miss",), prediction_cache.misses)], kind="counter")
+metrics.gauges("prediction_cache_hit_ratio", "Share of prediction cache lookups that hit.", (),
+               lambda: [((), prediction_cache.stats()["hit_rate"])])
+metrics.gauges("prediction_cache_entries", "Entries in the prediction cache.", (),
+               lambda: [((), prediction_cache.stats()["size"])])
+metrics.gauges("events_subscribers", "Connected /events clients.", (),
+               lambda: [((), broadcaster.stats()["subscribers"])])
+metrics.gauges("drift_report_running", "1 while a drift report is being rendered.", (),
+               lambda: [((), int(report_job.running))])
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text exposition of this worker's counters, histograms and gauges."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", ".model_cache")
+CACHE_MAX_BYTES = int(os.environ.get("MODEL_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    """Content-addressed on-disk cache of model artifacts.
+
+    Blobs live at <root>/<sha256>/<filename>. index.json maps
+    "<name>@<version>" to the blob's hash, size and last use time. Every
+    hit is re-hashed before it is returned, so a corrupt or truncated
+    file counts as a miss. Once the cache grows past max_bytes, the least
+    recently used blobs are evicted.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.root, "index.json")
+
+    def _read_index(self):
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp, self._index_path)
+
+    def _blob_path(self, entry):
+        return os.path.join(self.root, entry["sha256"], entry["filename"])
+
+    def get(self, name, version):
+        """Path of a verified cached artifact, or None."""
+        key = f"{name}@{version}"
+        with self._lock:
+            index = self._read_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            path = self._blob_path(entry)
+            if not os.path.exists(path) or sha256_file(path) != entry["sha256"]:
+                print(f"Cached artifact {key} failed integrity check, discarding")
+                index.pop(key)
+                self._write_index(index)
+                return None
+            entry["last_used"] = time.time()
+            self._write_index(index)
+            return path
+
+    def latest(self, name):
+        """(version, path) of the most recently used cached version of name, for offline starts."""
+        index = self._read_index()
+        candidates = [(e["last_used"], k) for k, e in index.items() if e["name"] == name]
+        for _, key in sorted(candidates, reverse=True):
+            version = index[key]["version"]
+            path = self.get(name, version)
+            if path is not None:
+                return version, path
+        return None, None
+
+    def put(self, name, version, src):
+        """Copy src into the cache and return the cached path."""
+        digest = sha256_file(src)
+        filename = os.path.basename(src)
+        blob_dir = os.path.join(self.root, digest)
+        dest = os.path.join(blob_dir, filename)
+        with self._lock:
+            if not os.path.exists(dest):
+                os.makedirs(blob_dir, exist_ok=True)
+                tmp = dest + ".tmp"
+                shutil.copyfile(src, tmp)
+                os.replace(tmp, dest)
+            index = self._read_index()
+            index[f"{name}@{version}"] = {
+                "name": name,
+                "version": version,
+                "sha256": digest,
+                "filename": filename,
+                "size": os.path.getsize(dest),
+                "last_used": time.time(),
+            }
+            self._evict(index)
+            self._write_index(index)
+        return dest
+
+    def _evict(self, index):
+        # blobs may be shared by several keys; size each blob once
+        blobs = {}
+        for key, e in index.items():
+            b = blobs.setdefault(e["sha256"], {"size": e["size"], "last_used": 0, "keys": []})
+            b["last_used"] = max(b["last_used"], e["last_used"])
+            b["keys"].append(key)
+        total = sum(b["size"] for b in blobs.values())
+        for digest, b in sorted(blobs.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.max_bytes or len(blobs) <= 1:
+                break
+            shutil.rmtree(os.path.join(self.root, digest), ignore_errors=True)
+            for key in b["keys"]:
+                index.pop(key, None)
+            total -= b["size"]
+            del blobs[digest]
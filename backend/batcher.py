@@ -0,0 +1,131 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+
+MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "2"))
+MAX_BATCH_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "64"))
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row requests into one vectorized call.
+
+    `score_fn` receives an (n, k) matrix and must return a sequence of n
+    results. It runs on `pool` (an executors.Pool; the loop's default
+    executor if None) so the event loop keeps accepting requests while a
+    batch is being scored.
+    """
+
+    def __init__(self, score_fn, n_features, max_wait_ms=MAX_WAIT_MS, max_batch_size=MAX_BATCH_SIZE, pool=None):
+        self.score_fn = score_fn
+        self.pool = pool
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        # rows are copied straight into this buffer; only one batch is scored at a time
+        self._buffer = np.empty((max_batch_size, n_features), dtype=np.float64)
+        self._queue = None
+        self._worker = None
+        self._closing = False
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "errors": 0,
+            "max_batch_seen": 0,
+            "total_queue_wait_s": 0.0,
+            "total_score_s": 0.0,
+        }
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, row):
+        """Queue one feature row (a sequence of n_features numbers) and wait for its result.
+
+        Raises ValueError for a row that is not n_features numbers; only
+        that request fails, the batch it would have joined is unaffected.
+        """
+        row = np.asarray(row, dtype=np.float64)
+        if row.shape != self._buffer.shape[1:]:
+            raise ValueError(f"expected {self._buffer.shape[1]} features, got {row.size}")
+        self._ensure_started()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, fut, time.perf_counter()))
+        return await fut
+
+    def close(self):
+        """Stop the worker task once the requests already queued are answered."""
+        self._closing = True
+        if self._worker is not None and not self._worker.done():
+            self._queue.put_nowait(None)  # wakes a worker parked on the empty queue
+
+    async def _collect(self):
+        first = await self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is not None:
+                batch.append(item)
+        # drain anything that is already waiting without blocking
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                batch.append(item)
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not (self._closing and self._queue.empty()):
+            batch = await self._collect()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            x = self._buffer[:len(batch)]
+            try:
+                # inside the try: whatever goes wrong fails this batch, never the worker
+                for i, (row, _, _) in enumerate(batch):
+                    x[i] = row
+                if self.pool is not None:
+                    results = await self.pool.run(self.score_fn, x)
+                else:
+                    results = await loop.run_in_executor(None, self.score_fn, x)
+            except Exception as exc:
+                self.stats["errors"] += 1
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                continue
+            finished = time.perf_counter()
+
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+            self.stats["total_queue_wait_s"] += sum(started - t for _, _, t in batch)
+            self.stats["total_score_s"] += finished - started
+
+            for (_, fut, _), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+
+    def snapshot(self):
+        s = dict(self.stats)
+        requests = s["requests"] or 1
+        batches = s["batches"] or 1
+        s["max_wait_ms"] = self.max_wait * 1000.0
+        s["max_batch_size"] = self.max_batch_size
+        s["queue_depth"] = self._queue.qsize() if self._queue is not None else 0
+        s["avg_batch_size"] = s["requests"] / batches
+        s["avg_queue_wait_ms"] = s["total_queue_wait_s"] / requests * 1000.0
+        s["avg_score_ms"] = s["total_score_s"] / batches * 1000.0
+        return s
@@ -0,0 +1,50 @@
+"""Compare the NumPy fast-path scorers against sklearn on the models in ./models.
+
+Usage: python benchmark_scorer.py [n_rows]
+"""
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from fast_scorer import agrees, compile_model
+from features import FEATURES
+from model_registry import MODEL_DIR, MODEL_NAMES
+
+
+def per_call_us(fn, x, repeat):
+    fn(x)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(x)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rng = np.random.default_rng(0)
+    batch = rng.normal(0.0, 50.0, size=(n_rows, len(FEATURES)))
+    row = batch[:1]
+
+    for name in MODEL_NAMES:
+        path = os.path.join(MODEL_DIR, f"{name}.pkl")
+        if not os.path.exists(path):
+            continue
+        model = joblib.load(path)
+        scorer = compile_model(model)
+        if scorer is None:
+            print(f"{name}: no fast path for {type(model).__name__}")
+            continue
+
+        print(f"{name}:")
+        print(f"  agrees with sklearn: {agrees(scorer, model, len(FEATURES))}")
+        print(f"  single row  sklearn {per_call_us(model.predict, row, 200):9.1f} us"
+              f"   fast {per_call_us(scorer.predict, row, 2000):9.1f} us")
+        print(f"  {n_rows} rows  sklearn {per_call_us(model.predict, batch, 20):9.1f} us"
+              f"   fast {per_call_us(scorer.predict, batch, 20):9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
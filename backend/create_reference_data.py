@@ -1,11 +1,16 @@
 import pandas as pd
+from reference_profile import build_profile, save_profile, PROFILE_FILE
 
 df = pd.read_csv("Diabetes_Final_Data_V2.csv")
 
 # Drop target column – keep only features
-df.drop("diabetic", axis=1).to_csv(
+reference = df.drop("diabetic", axis=1)
+reference.to_csv(
     "train_reference.csv",
     index=False
 )
 
-print("train_reference.csv created successfully")
\ No newline at end of file
+print("train_reference.csv created successfully")
+
+save_profile(build_profile(reference))
+print(f"{PROFILE_FILE} created successfully")
\ No newline at end of file
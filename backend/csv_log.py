@@ -0,0 +1,154 @@
+import fcntl
+import io
+import os
+
+import pandas as pd
+
+BLOCK_SIZE = 64 * 1024
+
+
+def _header(f):
+    f.seek(0)
+    header = f.readline()
+    return header, f.tell()
+
+
+def _line_start(f, pos, data_start):
+    """Offset of the first line that starts at or after pos."""
+    if pos <= data_start:
+        return data_start
+    f.seek(pos - 1)
+    f.readline()
+    return f.tell()
+
+
+def _parse(header, lines):
+    if not lines:
+        return []
+    df = pd.read_csv(io.BytesIO(header + b"".join(lines)))
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict(orient="records")
+
+
+def _timestamp(header, line, column):
+    return pd.Timestamp(_parse(header, [line])[0][column])
+
+
+def seek_time(path, since, column="timestamp"):
+    """Byte offset of the first row whose `column` is >= since.
+
+    Append-only logs are written in time order, so this is a binary search
+    over byte offsets and only parses O(log n) rows.
+    """
+    since = pd.Timestamp(since)
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header, data_start = _header(f)
+        lo, hi = data_start, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = _line_start(f, mid, data_start)
+            if start >= size:
+                hi = mid
+                continue
+            f.seek(start)
+            if _timestamp(header, f.readline(), column) < since:
+                lo = start + 1
+            else:
+                hi = mid
+        return _line_start(f, lo, data_start)
+
+
+def page(path, cursor=None, limit=100, until=None, column="timestamp"):
+    """Up to `limit` rows starting at byte offset `cursor`.
+
+    Returns (rows, next_cursor); pass next_cursor back to continue, or to
+    poll for rows appended later.
+    """
+    until = pd.Timestamp(until) if until is not None else None
+    with open(path, "rb") as f:
+        header, data_start = _header(f)
+        f.seek(max(int(cursor or 0), data_start))
+        lines = []
+        while len(lines) < limit:
+            pos = f.tell()
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                # partial row still being written: stop before it
+                f.seek(pos)
+                break
+            if until is not None and _timestamp(header, line, column) >= until:
+                f.seek(pos)
+                break
+            lines.append(line)
+        return _parse(header, lines), f.tell()
+
+
+def tail(path, n=100, until=None, column="timestamp"):
+    """Last n rows (before `until` if given), read backwards from the end of the file.
+
+    Returns (rows, next_cursor) where next_cursor points past the last
+    complete row, for forward polling with `page`.
+    """
+    with open(path, "rb") as f:
+        header, data_start = _header(f)
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+    if until is not None:
+        end = seek_time(path, until, column)
+    with open(path, "rb") as f:
+        pos = end
+        buf = b""
+        while pos > data_start and buf.count(b"\n") <= n:
+            step = min(BLOCK_SIZE, pos - data_start)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+        lines = buf.splitlines(keepends=True)
+        if lines and not lines[-1].endswith(b"\n"):
+            end -= len(lines[-1])
+            lines = lines[:-1]
+        return _parse(header, lines[-n:] if n else []), end
+
+
+def read_from(path, cursor=None):
+    """Every complete row from byte offset `cursor` on, as a DataFrame, plus the offset after it.
+
+    Feed the returned offset back in to read only rows appended since.
+    """
+    with open(path, "rb") as f:
+        header, data_start = _header(f)
+        start = max(int(cursor or 0), data_start)
+        f.seek(start)
+        data = f.read()
+    # a row still being written has no trailing newline yet: leave it for next time
+    data = data[:data.rfind(b"\n") + 1]
+    if not data:
+        return pd.DataFrame(columns=pd.read_csv(io.BytesIO(header)).columns), start
+    return pd.read_csv(io.BytesIO(header + data)), start + len(data)
+
+
+def append_row(path, row, columns=None):
+    """Append one row (a dict) to a CSV log, writing the header if the file is new.
+
+    A new file's header is `columns` (default: the row's keys). Rows added
+    to an existing file follow its header: missing keys are left empty and
+    keys it has no column for are dropped, so every line parses.
+
+    Every serving worker appends to the same files, so the existence check
+    and the write happen under an exclusive lock, and the row goes out in a
+    single write: readers never see a duplicate header or half a line.
+    """
+    with open(path, "a+b") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0, os.SEEK_END)
+            new = f.tell() == 0
+            if not new:
+                header, _ = _header(f)
+                columns = list(pd.read_csv(io.BytesIO(header)).columns)
+            df = pd.DataFrame([row], columns=columns)
+            f.write(df.to_csv(index=False, header=new).encode())
+            f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
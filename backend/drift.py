@@ -4,18 +4,79 @@ import pandas as pd
 import os
 import numpy as np
 import json
+import threading
+import time
 from datetime import datetime
+from features import FEATURES
+from prediction_logger import prediction_log, read_predictions, read_since
+import csv_log
+from drift_stats import DriftTracker
+from jobs import CoalescingJob
+from executors import drift_pool
+from metrics import stage_seconds
+from reference_profile import PROFILE_FILE, build_profile, load_profile, save_profile, means
 
-def run_drift_check():
+REFERENCE_FILE = "train_reference.csv"
+REPORT_FILE = "drift_report.html"
+
+_tracker = None
+_tracker_version = None  # profile version the tracker's histogram edges came from
+_tracker_lock = threading.Lock()
+_last_id = 0
+_profile = {"version": None, "profile": None}
+
+
+def has_reference():
+    return os.path.exists(PROFILE_FILE) or os.path.exists(REFERENCE_FILE)
+
+
+def get_reference_profile(model_version=None):
+    """Reference statistics, loaded once and reloaded only when the model version changes."""
+    if _profile["profile"] is None or _profile["version"] != model_version:
+        if os.path.exists(PROFILE_FILE):
+            profile = load_profile(PROFILE_FILE)
+        else:
+            # no precomputed profile yet: build one from the CSV and keep it
+            profile = build_profile(pd.read_csv(REFERENCE_FILE), model_version or "")
+            save_profile(profile, PROFILE_FILE)
+        _profile.update(version=model_version, profile=profile)
+    return _profile["profile"]
 
-    if not os.path.exists("train_reference.csv"):
-        return {"error": "train_reference.csv not found"}
 
-    if not os.path.exists("recent_predictions.csv"):
-        return {"error": "recent_predictions.csv not found. Call /predict first."}
+def _on_rows(rows):
+    x = np.array([[r.get(f) for f in FEATURES] for r in rows], dtype=float)
+    ts = pd.to_datetime(pd.Series([r.get("timestamp") for r in rows]), errors="coerce")
+    ts = ts.fillna(pd.Timestamp.now("UTC").tz_localize(None))
+    _tracker.update(x, (ts - pd.Timestamp(0)).dt.total_seconds().to_numpy())
 
-    reference = pd.read_csv("train_reference.csv")
-    current = pd.read_csv("recent_predictions.csv")
+
+def get_tracker(model_version=None):
+    """Streaming stats over logged predictions.
+
+    Histogram edges come from the reference profile so current and
+    reference histograms can be compared bin for bin. Each call folds in
+    only the rows logged since the previous one, read from the shared
+    database, so the stats cover predictions served by every worker.
+    A new model version brings a new profile: the tracker is rebuilt on
+    its edges and replays the log.
+    """
+    global _tracker, _tracker_version, _last_id
+    with _tracker_lock:
+        if _tracker is None or _tracker_version != model_version:
+            edges = get_reference_profile(model_version)["hist_edges"] if has_reference() else None
+            _tracker = DriftTracker(FEATURES, edges=edges)
+            _tracker_version = model_version
+            _last_id = 0
+        for rows, last_id in read_since(_last_id):
+            _on_rows(rows)
+            _last_id = last_id
+    return _tracker
+
+
+def build_drift_report():
+    """Render the Evidently HTML report. Reads every logged prediction."""
+    reference = pd.read_csv(REFERENCE_FILE)
+    current = read_predictions()
 
     # ✅ IMPORTANT FIX: align schemas
     if "prediction" in current.columns:
@@ -26,15 +87,46 @@ def run_drift_check():
 
     report = Report(metrics=[DataDriftPreset()])
     report.run(reference_data=reference, current_data=current)
-    report.save_html("drift_report.html")
+    # render next to the live file and swap, so /drift_report never serves a partial page
+    tmp = REPORT_FILE + ".tmp"
+    report.save_html(tmp)
+    os.replace(tmp, REPORT_FILE)
+
+
+def _render_report():
+    # the report runs in a separate process: make sure it sees every logged row
+    prediction_log.flush()
+    with stage_seconds.time("drift_report", "render"):
+        drift_pool.submit(build_drift_report).result()
+
+
+report_job = CoalescingJob(_render_report, name="drift-report")
+
+
+def run_drift_check(window="all", report=True, model_version=None):
+
+    if not has_reference():
+        return {"error": "train_reference.csv not found"}
+
+    with stage_seconds.time("drift", "stats"):
+        current = get_tracker(model_version).stats(window)
+    if current.count == 0:
+        return {"error": "no predictions logged yet. Call /predict first."}
+
+    if report and os.path.exists(REFERENCE_FILE):
+        report_job.request()
 
     # Basic numeric mean-shift detector (fallback/simple):
-    numeric_cols = reference.select_dtypes(include=[np.number]).columns.intersection(current.columns)
+    started = time.perf_counter()
+    ref_means = means(get_reference_profile(model_version))
+    cur_means = dict(zip(FEATURES, current.mean.tolist()))
     shifts = {}
     drift = False
-    for c in numeric_cols:
-        ref_mean = reference[c].mean()
-        cur_mean = current[c].mean()
+    for c in FEATURES:
+        if c not in ref_means:
+            continue
+        ref_mean = ref_means[c]
+        cur_mean = cur_means[c]
         if pd.isna(ref_mean) or pd.isna(cur_mean):
             continue
         rel = abs(cur_mean - ref_mean) / (abs(ref_mean) + 1e-9)
@@ -50,6 +142,7 @@ def run_drift_check():
     else:
         drift_score = 0.0
         max_shift = 0.0
+    stage_seconds.observe(time.perf_counter() - started, "drift", "compare")
 
     # append to drift log
     log_row = {
@@ -59,11 +152,15 @@ def run_drift_check():
         "max_shift": max_shift,
         "shifts": json.dumps(shifts)
     }
-    log_file = "drift_log.csv"
-    dfrow = pd.DataFrame([log_row])
-    if not os.path.exists(log_file):
-        dfrow.to_csv(log_file, index=False)
-    else:
-        dfrow.to_csv(log_file, mode="a", header=False, index=False)
+    with stage_seconds.time("drift", "log"):
+        csv_log.append_row("drift_log.csv", log_row)
 
-    return {"drift_report": "generated", "drift": drift, "shifts": shifts, "drift_score": drift_score}
\ No newline at end of file
+    return {
+        "drift_report": "queued" if report else "skipped",
+        "drift_report_generated_at": report_job.last_completed,
+        "drift": drift,
+        "shifts": shifts,
+        "drift_score": drift_score,
+        "window": window,
+        "count": int(current.count),
+    }
\ No newline at end of file
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+N_BINS = int(os.environ.get("DRIFT_HIST_BINS", "20"))
+BUCKET_S = float(os.environ.get("DRIFT_BUCKET_S", "60"))
+WINDOW_BUCKETS = int(os.environ.get("DRIFT_WINDOW_BUCKETS", "60"))
+
+
+class FeatureStats:
+    """Mergeable per-feature count, mean, M2 (Welford) and fixed-edge histograms."""
+
+    def __init__(self, n_features, edges=None):
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.edges = edges
+        self.hist = None if edges is None else np.zeros((n_features, edges.shape[1] - 1), dtype=np.int64)
+
+    def _merge_moments(self, n, mean, m2):
+        if n == 0:
+            return
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    def update(self, x):
+        x = x[~np.isnan(x).any(axis=1)]
+        if len(x) == 0:
+            return
+        batch_mean = x.mean(axis=0)
+        self._merge_moments(len(x), batch_mean, ((x - batch_mean) ** 2).sum(axis=0))
+        if self.edges is not None:
+            for j in range(x.shape[1]):
+                e = self.edges[j]
+                idx = np.searchsorted(e, x[:, j], side="right") - 1
+                idx = np.clip(idx, 0, len(e) - 2)
+                self.hist[j] += np.bincount(idx, minlength=len(e) - 1)
+
+    def merge(self, other):
+        self._merge_moments(other.count, other.mean, other.m2)
+        if self.hist is not None and other.hist is not None:
+            self.hist += other.hist
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return np.zeros_like(self.mean)
+        return self.m2 / (self.count - 1)
+
+    def to_dict(self, names):
+        out = {"count": int(self.count), "features": {}}
+        var = self.variance
+        for j, name in enumerate(names):
+            f = {"mean": float(self.mean[j]), "variance": float(var[j])}
+            if self.hist is not None:
+                f["histogram"] = self.hist[j].tolist()
+            out["features"][name] = f
+        return out
+
+
+class DriftTracker:
+    """Streaming feature statistics over all predictions plus a sliding window.
+
+    The window is made of tumbling buckets BUCKET_S seconds wide; the last
+    WINDOW_BUCKETS of them are kept and merged on demand, so both updates and
+    reads cost O(features) no matter how many predictions were logged.
+    """
+
+    def __init__(self, names, edges=None, bucket_s=BUCKET_S, window_buckets=WINDOW_BUCKETS):
+        self.names = list(names)
+        self.edges = edges
+        self.bucket_s = bucket_s
+        self.window_buckets = window_buckets
+        self.total = FeatureStats(len(self.names), edges)
+        self._buckets = deque()
+        self._lock = threading.Lock()
+
+    def _bucket(self, key):
+        if self._buckets and self._buckets[-1][0] == key:
+            return self._buckets[-1][1]
+        if self._buckets and key < self._buckets[-1][0]:
+            for k, stats in self._buckets:
+                if k == key:
+                    return stats
+            return None
+        stats = FeatureStats(len(self.names), self.edges)
+        self._buckets.append((key, stats))
+        return stats
+
+    def _expire(self, now):
+        oldest = int(now // self.bucket_s) - self.window_buckets + 1
+        while self._buckets and self._buckets[0][0] < oldest:
+            self._buckets.popleft()
+
+    def update(self, x, ts=None):
+        """Fold rows of x in. `ts` holds epoch seconds per row; defaults to now."""
+        x = np.asarray(x, dtype=float).reshape(-1, len(self.names))
+        if len(x) == 0:
+            return
+        now = time.time()
+        with self._lock:
+            self.total.update(x)
+            if ts is None:
+                keys = np.full(len(x), int(now // self.bucket_s))
+            else:
+                keys = (np.asarray(ts, dtype=float) // self.bucket_s).astype(int)
+            oldest = int(now // self.bucket_s) - self.window_buckets + 1
+            for key in np.unique(keys):
+                if key < oldest:
+                    continue
+                stats = self._bucket(int(key))
+                if stats is not None:
+                    stats.update(x[keys == key])
+            self._expire(now)
+
+    def stats(self, window="all"):
+        """Return a merged copy of the cumulative ("all") or sliding-window stats."""
+        with self._lock:
+            merged = FeatureStats(len(self.names), self.edges)
+            if window == "all":
+                merged.merge(self.total)
+            else:
+                self._expire(time.time())
+                for _, stats in self._buckets:
+                    merged.merge(stats)
+            return merged
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+
+QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "100"))
+DROP_POLICY = os.environ.get("EVENTS_DROP_POLICY", "drop_oldest")  # or "drop_newest"
+HEARTBEAT_S = float(os.environ.get("EVENTS_HEARTBEAT_S", "15"))
+
+
+class Subscription:
+    def __init__(self, maxsize, policy):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.policy = policy
+        self.dropped = 0
+
+    def offer(self, message):
+        if self.queue.full():
+            self.dropped += 1
+            if self.policy == "drop_newest":
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class Broadcaster:
+    """In-process fan-out of events to SSE clients.
+
+    Each event is serialised once in `publish`, then handed to every
+    subscriber's bounded queue. A slow client only loses its own events
+    (per DROP_POLICY); it never slows the publisher or other clients.
+    `publish` is safe to call from worker threads.
+    """
+
+    def __init__(self, maxsize=QUEUE_SIZE, policy=DROP_POLICY):
+        self.maxsize = maxsize
+        self.policy = policy
+        self._subs = set()
+        self._loop = None
+        self.latest = None
+        self.published = 0
+
+    def publish(self, event):
+        message = json.dumps(event, default=str)
+        self.latest = message
+        self.published += 1
+        loop = self._loop
+        if loop is None or not self._subs:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(message)
+        else:
+            loop.call_soon_threadsafe(self._deliver, message)
+
+    def _deliver(self, message):
+        for sub in list(self._subs):
+            sub.offer(message)
+
+    @asynccontextmanager
+    async def subscribe(self):
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(self.maxsize, self.policy)
+        if self.latest is not None:
+            sub.offer(self.latest)
+        self._subs.add(sub)
+        try:
+            yield sub
+        finally:
+            self._subs.discard(sub)
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subs),
+            "published": self.published,
+            "queue_size": self.maxsize,
+            "drop_policy": self.policy,
+            "queue_depths": [s.queue.qsize() for s in self._subs],
+            "dropped": sum(s.dropped for s in self._subs),
+        }
+
+
+broadcaster = Broadcaster()
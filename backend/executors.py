@@ -0,0 +1,91 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "4"))
+INFERENCE_MAX_PENDING = int(os.environ.get("INFERENCE_MAX_PENDING", "1024"))
+DRIFT_WORKERS = int(os.environ.get("DRIFT_WORKERS", "1"))
+DRIFT_MAX_PENDING = int(os.environ.get("DRIFT_MAX_PENDING", "4"))
+
+
+class PoolSaturated(RuntimeError):
+    """Raised instead of queueing when a pool already has max_pending tasks in flight."""
+
+
+class Pool:
+    """A thread or process executor with a hard cap on queued work and basic counters.
+
+    Each kind of work gets its own Pool, so a backlog in one (e.g. drift
+    reports) cannot starve another (e.g. inference).
+    """
+
+    def __init__(self, name, kind="thread", max_workers=4, max_pending=64):
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_s = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn: the server process has threads, which fork does not copy safely
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self.in_flight >= self.max_pending:
+                self.rejected += 1
+                raise PoolSaturated(f"{self.name} pool is saturated ({self.in_flight} tasks in flight)")
+            self.in_flight += 1
+            self.submitted += 1
+            executor = self._get_executor()
+        started = time.perf_counter()
+        future = executor.submit(fn, *args)
+
+        def done(f):
+            with self._lock:
+                self.in_flight -= 1
+                self.total_s += time.perf_counter() - started
+                if f.cancelled() or f.exception() is not None:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+        future.add_done_callback(done)
+        return future
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self):
+        finished = self.completed + self.failed
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.max_workers),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_latency_ms": self.total_s / finished * 1000.0 if finished else 0.0,
+        }
+
+
+inference_pool = Pool("inference", "thread", INFERENCE_WORKERS, INFERENCE_MAX_PENDING)
+drift_pool = Pool("drift", "process", DRIFT_WORKERS, DRIFT_MAX_PENDING)
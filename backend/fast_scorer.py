@@ -0,0 +1,207 @@
+import numpy as np
+
+SCORER_SUFFIX = ".scorer.npz"
+
+
+class LinearScorer:
+    """Binary logistic regression as a dot product; no input validation."""
+
+    def __init__(self, coef, intercept, classes):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(np.ravel(intercept)[0])
+        self.classes = np.asarray(classes)
+
+    def decision_function(self, x):
+        return x @ self.coef + self.intercept
+
+    def predict_proba(self, x):
+        p = 1.0 / (1.0 + np.exp(-self.decision_function(x)))
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, x):
+        return self.classes[(self.decision_function(x) > 0).astype(np.intp)]
+
+    def to_arrays(self):
+        return {"kind": np.array("linear"), "coef": self.coef,
+                "intercept": np.array([self.intercept]), "classes": self.classes}
+
+
+class ForestScorer:
+    """Random forest flattened into one set of node arrays.
+
+    All trees are walked together, one level per step, so scoring costs
+    max_depth vectorized gathers rather than a Python loop over trees.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes = np.asarray(classes)
+
+    @classmethod
+    def from_estimators(cls, estimators, classes):
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for est in estimators:
+            t = est.tree_
+            leaf = t.children_left == -1
+            roots.append(offset)
+            feature.append(np.where(leaf, 0, t.feature))
+            threshold.append(t.threshold)
+            # leaves point at themselves so extra steps are no-ops
+            own = np.arange(t.node_count) + offset
+            left.append(np.where(leaf, own, t.children_left + offset))
+            right.append(np.where(leaf, own, t.children_right + offset))
+            v = t.value[:, 0, :]
+            value.append(v / v.sum(axis=1, keepdims=True))
+            offset += t.node_count
+            max_depth = max(max_depth, t.max_depth)
+        return cls(
+            np.concatenate(feature).astype(np.intp),
+            np.concatenate(threshold),
+            np.concatenate(left).astype(np.intp),
+            np.concatenate(right).astype(np.intp),
+            np.concatenate(value),
+            np.asarray(roots, dtype=np.intp),
+            max_depth,
+            classes,
+        )
+
+    def predict_proba(self, x):
+        # thresholds are in raw float64 input space; see raw_thresholds
+        x = np.asarray(x, dtype=np.float64)
+        rows = np.arange(x.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (x.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = x[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].mean(axis=1)
+
+    def predict(self, x):
+        return self.classes[self.predict_proba(x).argmax(axis=1)]
+
+    def to_arrays(self):
+        return {"kind": np.array("forest"), "feature": self.feature, "threshold": self.threshold,
+                "left": self.left, "right": self.right, "value": self.value, "roots": self.roots,
+                "max_depth": np.array(self.max_depth), "classes": self.classes}
+
+
+def unwrap_pipeline(model, n_features):
+    """Split a serving pipeline into (shift, scale, estimator) with x_model = (x - shift) / scale.
+
+    Encoders are identity on numeric rows and StandardScalers compose into
+    one affine map. Returns None if the pipeline has any other step.
+    """
+    shift = np.zeros(n_features)
+    scale = np.ones(n_features)
+    if type(model).__name__ != "Pipeline":
+        return shift, scale, model
+    for _, step in model.steps[:-1]:
+        kind = type(step).__name__
+        if kind == "CategoricalEncoder":
+            continue
+        if kind != "StandardScaler":
+            return None
+        m = step.mean_ if step.mean_ is not None else np.zeros(n_features)
+        s = step.scale_ if step.scale_ is not None else np.ones(n_features)
+        shift = shift + m * scale
+        scale = scale * s
+    return shift, scale, model.steps[-1][1]
+
+
+def _ordered(x):
+    """Map float64 values to uint64 keys in the same order (bit tricks, no rounding)."""
+    bits = x.view(np.int64)
+    return (bits ^ ((bits >> 63) & 0x7FFFFFFFFFFFFFFF)).view(np.uint64) ^ np.uint64(1 << 63)
+
+
+def _from_ordered(keys):
+    bits = (keys ^ np.uint64(1 << 63)).view(np.int64)
+    return (bits ^ ((bits >> 63) & 0x7FFFFFFFFFFFFFFF)).view(np.float64)
+
+
+def raw_thresholds(threshold, shift, scale):
+    """Split thresholds moved from model space into raw float64 input space, exactly.
+
+    sklearn routes a row left when float32((x - shift) / scale) <= t. That
+    map is monotone in x, so the rows going left are exactly x <= T for
+    the largest float64 T that still goes left; T is found by bisection
+    over the float64 values. Folding t * scale + shift instead would route
+    rows within rounding distance of a split differently from sklearn.
+    """
+    threshold = np.asarray(threshold, dtype=np.float64)
+    shift = np.broadcast_to(np.asarray(shift, dtype=np.float64), threshold.shape)
+    scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), threshold.shape)
+
+    def left(x):
+        with np.errstate(over="ignore", invalid="ignore"):
+            return ((x - shift) / scale).astype(np.float32) <= threshold
+
+    # invariant: lo goes left, hi does not
+    lo = np.full(threshold.shape, _ordered(np.array([-np.finfo(np.float64).max]))[0])
+    hi = np.full(threshold.shape, _ordered(np.array([np.finfo(np.float64).max]))[0])
+    for _ in range(64):
+        mid = lo + (hi - lo) // np.uint64(2)
+        go = left(_from_ordered(mid))
+        lo = np.where(go, mid, lo)
+        hi = np.where(go, hi, mid)
+    return _from_ordered(lo)
+
+
+def compile_model(model, n_features=None):
+    """Fast scorer for a fitted model or serving pipeline, or None if unsupported.
+
+    Scaling is folded into the parameters (coefficients for linear models,
+    split thresholds for forests) so scoring does no extra array passes.
+    """
+    final = model.steps[-1][1] if type(model).__name__ == "Pipeline" else model
+    n_features = n_features or getattr(final, "n_features_in_", None)
+    if n_features is None:
+        return None
+    parts = unwrap_pipeline(model, n_features)
+    if parts is None:
+        return None
+    shift, scale, est = parts
+    name = type(est).__name__
+    if name == "LogisticRegression" and len(est.classes_) == 2:
+        w = est.coef_.ravel()
+        coef = w / scale
+        intercept = est.intercept_[0] - np.dot(coef, shift)
+        return LinearScorer(coef, [intercept], est.classes_)
+    if name == "RandomForestClassifier" and est.n_outputs_ == 1:
+        scorer = ForestScorer.from_estimators(est.estimators_, est.classes_)
+        scorer.threshold = raw_thresholds(scorer.threshold, shift[scorer.feature], scale[scorer.feature])
+        return scorer
+    return None
+
+
+def save_scorer(model, path, source_version=""):
+    """Export a compact scoring artifact next to a trained model. Returns False if unsupported."""
+    scorer = compile_model(model)
+    if scorer is None:
+        return False
+    np.savez(path, source_version=np.array(source_version), **scorer.to_arrays())
+    return True
+
+
+def load_scorer(path):
+    """Returns (scorer, source_version)."""
+    with np.load(path, allow_pickle=False) as a:
+        kind = str(a["kind"])
+        if kind == "linear":
+            scorer = LinearScorer(a["coef"], a["intercept"], a["classes"])
+        else:
+            scorer = ForestScorer(a["feature"], a["threshold"], a["left"], a["right"], a["value"],
+                                  a["roots"], a["max_depth"], a["classes"])
+        return scorer, str(a["source_version"])
+
+
+def agrees(scorer, model, n_features, n=256, atol=1e-6, seed=0):
+    """Check the scorer reproduces model.predict_proba on random probes."""
+    x = np.random.default_rng(seed).normal(0.0, 50.0, size=(n, n_features))
+    return bool(np.allclose(scorer.predict_proba(x), model.predict_proba(x), atol=atol))
@@ -0,0 +1,17 @@
+# Model input columns, in the order the models were trained on.
+FEATURES = [
+    "age",
+    "gender",
+    "pulse_rate",
+    "systolic_bp",
+    "diastolic_bp",
+    "glucose",
+    "height",
+    "weight",
+    "bmi",
+    "family_diabetes",
+    "hypertensive",
+    "family_hypertension",
+    "cardiovascular_disease",
+    "stroke",
+]
@@ -0,0 +1,170 @@
+import os
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import csv_log
+from features import FEATURES
+
+CHECKPOINT_FILE = os.environ.get("TRAIN_CHECKPOINT", "train_checkpoint.joblib")
+OBSERVATIONS_FILE = os.environ.get("OBSERVATIONS_FILE", "observations.csv")
+LABEL = "diabetic"
+RESERVOIR_SIZE = int(os.environ.get("TRAIN_RESERVOIR_SIZE", "5000"))
+RF_TREES_PER_UPDATE = int(os.environ.get("TRAIN_RF_TREES_PER_UPDATE", "20"))
+RF_MAX_TREES = int(os.environ.get("TRAIN_RF_MAX_TREES", "400"))
+# after this many incremental updates the next retrain rebuilds from scratch
+MAX_UPDATES = int(os.environ.get("TRAIN_MAX_INCREMENTAL_UPDATES", "10"))
+
+
+class Reservoir:
+    """Fixed-size uniform sample of every training row seen so far (Algorithm R).
+
+    Incremental updates train on the new rows plus this sample, so models
+    do not forget older data while each update stays O(new + size).
+    """
+
+    def __init__(self, size, n_features, seed=42):
+        self.size = size
+        self.X = np.empty((0, n_features))
+        self.y = np.empty(0)
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, X, y):
+        X, y = np.asarray(X, dtype=float), np.asarray(y)
+        free = max(0, self.size - len(self.X))
+        if free:
+            self.X = np.vstack([self.X, X[:free]])
+            self.y = np.concatenate([self.y, y[:free]]).astype(y.dtype)
+        rest = np.arange(free, len(X))
+        if len(rest):
+            # row i replaces a random slot with probability size / (rows seen before it + 1)
+            slots = self.rng.integers(0, self.seen + rest + 1)
+            keep = slots < self.size
+            self.X[slots[keep]] = X[rest[keep]]
+            self.y[slots[keep]] = y[rest[keep]]
+        self.seen += len(X)
+
+
+def labeled_observations(cursor=None, target_map=None, path=OBSERVATIONS_FILE):
+    """Rows appended to the observations log since `cursor` that carry a label.
+
+    Returns (df, next_cursor). Unlabeled observations cannot be trained on
+    and are skipped.
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=FEATURES + [LABEL]), cursor
+    df, next_cursor = csv_log.read_from(path, cursor)
+    if LABEL not in df.columns:
+        return df.iloc[0:0], next_cursor
+    df = df[df[LABEL].notna()]
+    if target_map and not pd.api.types.is_numeric_dtype(df[LABEL]):
+        df = df.assign(**{LABEL: df[LABEL].map(target_map)})
+    return df[df[LABEL].notna()], next_cursor
+
+
+def save_checkpoint(checkpoint, path=CHECKPOINT_FILE):
+    tmp = path + ".tmp"
+    joblib.dump(checkpoint, tmp)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path=CHECKPOINT_FILE):
+    if not os.path.exists(path):
+        return None
+    checkpoint = joblib.load(path)
+    if checkpoint.get("features") != FEATURES:
+        print("Training checkpoint was built for a different feature list; ignoring it")
+        return None
+    return checkpoint
+
+
+def new_checkpoint(models, data, cursor, params):
+    """Training state after a full rebuild: fitted models, preprocessors, held-out set and a reservoir."""
+    reservoir = Reservoir(RESERVOIR_SIZE, len(FEATURES))
+    # real rows only: SMOTE's synthetic ones would be resampled again on every update
+    # (caches prepared before X_base existed only have the resampled split)
+    reservoir.add(data.get("X_base", data["X_train"]), data.get("y_base", data["y_train"]))
+    return {
+        "features": FEATURES,
+        "models": models,
+        "params": params,
+        "scaler": data["scaler"],
+        "encoder": data["encoder"],
+        "X_test": np.asarray(data["X_test"]),
+        "y_test": np.asarray(data["y_test"]),
+        "X_calib": data.get("X_calib"),
+        "y_calib": data.get("y_calib"),
+        "reservoir": reservoir,
+        "cursor": cursor,
+        "updates": 0,
+        "rows_since_full": 0,
+        "created_at": datetime.utcnow().isoformat(),
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+
+
+def _update_model(model, X, y):
+    kind = type(model).__name__
+    if kind == "RandomForestClassifier":
+        # new trees learn the new data; the oldest are retired past RF_MAX_TREES
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + RF_TREES_PER_UPDATE)
+        model.fit(X, y)
+        if len(model.estimators_) > RF_MAX_TREES:
+            model.estimators_ = model.estimators_[-RF_MAX_TREES:]
+            model.set_params(n_estimators=RF_MAX_TREES)
+    elif kind == "LogisticRegression":
+        # liblinear cannot warm start; lbfgs continues from the current coefficients
+        model.set_params(solver="lbfgs", warm_start=True, max_iter=1000)
+        model.fit(X, y)
+    else:
+        # no incremental form (e.g. SVC): refit on the bounded sample
+        model.fit(X, y)
+    return model
+
+
+def update(checkpoint, df, timer):
+    """Fold new labeled rows into every model in the checkpoint. Returns the updated models.
+
+    The scaler and encoder stay as fitted at the last full rebuild, so
+    warm-started coefficients remain valid; new category values that the
+    encoder has never seen are dropped.
+    """
+    with timer.stage("preprocess (new rows)"):
+        encoder = checkpoint["encoder"]
+        if encoder is not None:
+            df = encoder.encode_frame(df)
+        X = df[FEATURES].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        y = df[LABEL].to_numpy()
+        valid = ~np.isnan(X).any(axis=1)
+        X = checkpoint["scaler"].transform(X[valid])
+        y = y[valid].astype(checkpoint["y_test"].dtype)
+
+    reservoir = checkpoint["reservoir"]
+    X_fit = np.vstack([X, reservoir.X])
+    y_fit = np.concatenate([y, reservoir.y]).astype(y.dtype)
+    if len(np.unique(y_fit)) < 2:
+        raise ValueError("incremental update needs both classes in the new rows plus reservoir")
+
+    for name, model in checkpoint["models"].items():
+        started = time.perf_counter()
+        _update_model(model, X_fit, y_fit)
+        timer.record(f"update {name}", time.perf_counter() - started)
+        print(f"{name} updated on {len(X)} new + {len(reservoir.X)} reservoir rows")
+
+    reservoir.add(X, y)
+    checkpoint["updates"] += 1
+    checkpoint["rows_since_full"] += len(X)
+    checkpoint["updated_at"] = datetime.utcnow().isoformat()
+    return checkpoint["models"]
+
+
+def needs_full_rebuild(checkpoint):
+    if checkpoint is None:
+        return "no training checkpoint"
+    if checkpoint["updates"] >= MAX_UPDATES:
+        return f"{checkpoint['updates']} incremental updates since the last full rebuild"
+    return None
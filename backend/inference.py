@@ -1,24 +1,89 @@
 import numpy as np
-from prediction_logger import log_prediction
+from features import FEATURES
+from prediction_logger import log_prediction, log_predictions
+from metrics import stage_seconds
+
 
 def predict(data: dict, model):
-    x = np.array([[
-        data["age"],
-        data["gender"],
-        data["pulse_rate"],
-        data["systolic_bp"],
-        data["diastolic_bp"],
-        data["glucose"],
-        data["height"],
-        data["weight"],
-        data["bmi"],
-        data["family_diabetes"],
-        data["hypertensive"],
-        data["family_hypertension"],
-        data["cardiovascular_disease"],
-        data["stroke"]
-    ]])
-
-    pred = int(model.predict(x)[0])
+    with stage_seconds.time("predict", "parse"):
+        x = to_row(data)
+    with stage_seconds.time("predict", "model"):
+        pred = int(model.predict(x)[0])
     log_prediction(data, pred)
     return {"prediction": pred}
+
+
+def to_row(data: dict):
+    """Build a (1, 14) feature row in training column order."""
+    return np.array([[data[f] for f in FEATURES]], dtype=float)
+
+
+def encode_row(row, encoder):
+    """A FEATURES-ordered row as floats, with category strings replaced by the encoder's codes.
+
+    Raises ValueError for a value that is not a number, or a category
+    the model has no encoder (or no code) for.
+    """
+    return tuple(_code(f, v, encoder) for f, v in zip(FEATURES, row))
+
+
+def _code(name, value, encoder):
+    if isinstance(value, str) and encoder is not None:
+        return encoder.code(name, value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number for this model, got {value!r}") from None
+
+
+def _column(name, values, encoder):
+    try:
+        return np.asarray(values, dtype=float)
+    except ValueError:
+        if encoder is None:
+            raise
+        # category strings: only now pay for a per-value lookup
+        return np.array([encoder.code(name, v) for v in values], dtype=float)
+
+
+def to_matrix(data, encoder=None):
+    """Build an (n, 14) feature matrix from a list of records, a dict of columns,
+    or the positional form {"rows": [[14 numbers], ...]}.
+
+    Records and columns may carry category strings, mapped with `encoder`.
+    """
+    if isinstance(data, dict):
+        if "rows" in data:
+            x = np.asarray(data["rows"], dtype=float)
+            if x.ndim != 2 or x.shape[1] != len(FEATURES):
+                raise ValueError(f"rows must be a list of {len(FEATURES)}-value lists")
+            return x
+        return np.column_stack([_column(f, data[f], encoder) for f in FEATURES])
+    rows = [[r[f] for f in FEATURES] for r in data]
+    try:
+        x = np.array(rows, dtype=float)
+    except ValueError:
+        if encoder is None:
+            raise
+        x = np.array([encode_row(r, encoder) for r in rows], dtype=float)
+    return x.reshape(-1, len(FEATURES))
+
+
+def predict_batch(data, model, encoder=None):
+    with stage_seconds.time("predict_batch", "parse"):
+        x = to_matrix(data, encoder)
+    if x.shape[0] == 0:
+        return {"predictions": [], "count": 0}
+
+    with stage_seconds.time("predict_batch", "model"):
+        preds = model.predict(x).astype(int)
+        result = {"predictions": preds.tolist(), "count": int(x.shape[0])}
+        if hasattr(model, "predict_proba"):
+            try:
+                result["probabilities"] = model.predict_proba(x)[:, 1].tolist()
+            except Exception:
+                # e.g. SVC trained without probability=True
+                pass
+
+    log_predictions(x, preds, FEATURES)
+    return result
@@ -0,0 +1,72 @@
+import threading
+import time
+from datetime import datetime
+
+
+class CoalescingJob:
+    """Run `fn` on a background thread, at most one at a time.
+
+    `request()` never blocks. Requests that arrive while a run is in
+    progress are collapsed into a single follow-up run, so a burst of N
+    requests costs at most two executions.
+    """
+
+    def __init__(self, fn, name="job"):
+        self.fn = fn
+        self.name = name
+        self._pending = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.running = False
+        self.requests = 0
+        self.runs = 0
+        self.coalesced = 0
+        self.last_started = None
+        self.last_completed = None
+        self.last_duration_s = None
+        self.last_error = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def request(self):
+        self._ensure_started()
+        self.requests += 1
+        if self._pending.is_set():
+            self.coalesced += 1
+        self._pending.set()
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            self._pending.clear()
+            self.running = True
+            self.last_started = datetime.utcnow().isoformat()
+            started = time.perf_counter()
+            try:
+                self.fn()
+                self.last_completed = datetime.utcnow().isoformat()
+                self.last_error = None
+            except Exception as exc:
+                self.last_error = str(exc)
+                print(f"{self.name} failed: {exc}")
+            finally:
+                self.last_duration_s = time.perf_counter() - started
+                self.runs += 1
+                self.running = False
+
+    def status(self):
+        return {
+            "running": self.running,
+            "pending": self._pending.is_set(),
+            "requests": self.requests,
+            "runs": self.runs,
+            "coalesced": self.coalesced,
+            "last_started": self.last_started,
+            "last_completed": self.last_completed,
+            "last_duration_s": self.last_duration_s,
+            "last_error": self.last_error,
+        }
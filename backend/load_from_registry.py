@@ -1,5 +1,9 @@
 import joblib
 import os
+import shutil
+import tempfile
+
+from artifact_cache import ArtifactCache, sha256_file
 
 try:
     from comet_ml.api import API
@@ -7,38 +11,115 @@ except Exception:
     API = None
 
 
-def load_latest_model():
-    if API is None:
-        print("comet_ml not available — attempting to load local model from ./models")
-        model_path = os.path.join("models", "LogisticRegression.pkl")
-        if not os.path.exists(model_path):
-            raise RuntimeError("comet_ml not installed and local model not found at ./models/LogisticRegression.pkl")
-        model = joblib.load(model_path)
-        print("Loaded local model successfully")
-        return model
+MODEL_DIR = "models"
+MODEL_NAME = "LogisticRegression"
+MODEL_PATH = os.path.join(MODEL_DIR, f"{MODEL_NAME}.pkl")
+
+
+def artifact_version(path=MODEL_PATH):
+    """Short content hash of a model artifact, used as its version tag."""
+    return sha256_file(path)[:12]
+
+
+class CometRegistry:
+    """Models logged to Comet experiments; the newest experiment is the latest version."""
+
+    def __init__(self, workspace="shrxyxs", project_name="diabetes-prediction"):
+        print("Connecting to Comet...")
+        self.api = API(api_key=os.environ.get("COMET_API_KEY", "API_KEY"))
+        self.workspace = workspace
+        self.project_name = project_name
+        self._experiment = None
+
+    def latest_version(self, name):
+        print("Fetching experiments...")
+        experiments = self.api.get_experiments(
+            workspace=self.workspace,
+            project_name=self.project_name
+        )
+        if not experiments:
+            raise RuntimeError("No experiments found")
+        self._experiment = experiments[0]  # latest experiment
+        return self._experiment.id
+
+    def fetch(self, name, version, dest_dir):
+        print("Downloading model...")
+        self._experiment.download_model(name, dest_dir)
+        return os.path.join(dest_dir, f"{name}.pkl")
 
-    print("Connecting to Comet...")
-    api = API(api_key="API_KEY")
 
-    print("Fetching experiments...")
-    experiments = api.get_experiments(
-        workspace="shrxyxs",
-        project_name="diabetes-prediction"
-    )
+class LocalRegistry:
+    """Directory laid out as <root>/<name>/<version>/<name>.pkl; the highest version sorts last.
 
-    if not experiments:
-        raise RuntimeError("No experiments found")
+    Stands in for Comet in tests and offline setups.
+    """
 
-    exp = experiments[0]  # latest experiment
+    def __init__(self, root):
+        self.root = root
 
-    os.makedirs("models", exist_ok=True)
+    def latest_version(self, name):
+        versions = sorted(os.listdir(os.path.join(self.root, name)))
+        if not versions:
+            raise RuntimeError(f"No versions of {name} in {self.root}")
+        return versions[-1]
 
-    print("Downloading model...")
-    exp.download_model("LogisticRegression", "models")
+    def fetch(self, name, version, dest_dir):
+        src = os.path.join(self.root, name, version, f"{name}.pkl")
+        dest = os.path.join(dest_dir, f"{name}.pkl")
+        shutil.copyfile(src, dest)
+        return dest
 
-    model_path = os.path.join("models", "LogisticRegression.pkl")
-    model = joblib.load(model_path)
 
+def get_registry():
+    """Registry backend from MODEL_REGISTRY: "comet" (default when installed), "local" or "none"."""
+    kind = os.environ.get("MODEL_REGISTRY", "comet" if API is not None else "none")
+    if kind == "local":
+        return LocalRegistry(os.environ.get("LOCAL_REGISTRY_DIR", "registry"))
+    if kind == "comet" and API is not None:
+        return CometRegistry()
+    return None
+
+
+def _install(path, dest=MODEL_PATH):
+    """Place a cached artifact at the serving path, skipping the copy if it is already there."""
+    if os.path.exists(dest) and sha256_file(dest) == sha256_file(path):
+        return dest
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = dest + ".tmp"
+    shutil.copyfile(path, tmp)
+    os.replace(tmp, dest)
+    return dest
+
+
+def fetch_latest_model(name=MODEL_NAME):
+    """Install the latest registered artifact at the serving path without loading it; returns the path."""
+    registry = get_registry()
+    if registry is None:
+        print("comet_ml not available — using the local model in ./models")
+        if not os.path.exists(MODEL_PATH):
+            raise RuntimeError("comet_ml not installed and local model not found at ./models/LogisticRegression.pkl")
+        return MODEL_PATH
+
+    cache = ArtifactCache()
+    try:
+        version = registry.latest_version(name)
+    except Exception as exc:
+        # registry unreachable: fall back to whatever we served last
+        version, path = cache.latest(name)
+        if path is None:
+            raise RuntimeError(f"Model registry unavailable and no cached {name}") from exc
+        print(f"Model registry unavailable ({exc}); using cached {name}@{version}")
+    else:
+        path = cache.get(name, version)
+        if path is not None:
+            print(f"Using cached {name}@{version}")
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = cache.put(name, version, registry.fetch(name, version, tmp))
+    return _install(path)
+
+
+def load_latest_model(name=MODEL_NAME):
+    model = joblib.load(fetch_latest_model(name), mmap_mode="r")
     print("Model loaded successfully")
     return model
-
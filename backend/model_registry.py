@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import joblib
+
+from load_from_registry import artifact_version
+from fast_scorer import SCORER_SUFFIX, agrees, compile_model, load_scorer
+from features import FEATURES
+from preprocessing import encoder_of
+
+MODEL_DIR = os.environ.get("MODEL_DIR", "models")
+MODEL_NAMES = ["LogisticRegression", "RandomForest", "SVM"]
+DEFAULT_MODEL = os.environ.get("DEFAULT_MODEL", "LogisticRegression")
+POLL_INTERVAL_S = float(os.environ.get("MODEL_POLL_INTERVAL_S", "10"))
+KEEP_VERSIONS = int(os.environ.get("MODEL_KEEP_VERSIONS", "2"))
+FAST_SCORER = os.environ.get("FAST_SCORER", "1") == "1"
+
+
+class ModelEntry:
+    def __init__(self, name, version, model, path, scorer=None):
+        self.name = name
+        self.version = version
+        self.model = model
+        self.path = path
+        self.scorer = scorer
+        # maps category strings in requests to the codes the model was trained on
+        self.encoder = encoder_of(model)
+        self.loaded_at = datetime.utcnow().isoformat()
+
+    @property
+    def predictor(self):
+        """Object used for scoring: the NumPy fast path when available, else the sklearn model."""
+        return self.scorer if self.scorer is not None else self.model
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "model_type": type(self.model).__name__,
+            "fast_path": type(self.scorer).__name__ if self.scorer is not None else None,
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    """Loaded model versions, keyed by content hash, with an atomically swapped active pointer.
+
+    Lookups read plain dict references and never take a lock, so a reload
+    swapping in a new version does not stall predictions; requests that
+    already hold an entry finish on the version they started with. The
+    last KEEP_VERSIONS versions of each model stay loaded so callers can
+    pin one explicitly.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, names=MODEL_NAMES, default=DEFAULT_MODEL):
+        self.model_dir = model_dir
+        self.names = list(names)
+        self.active_name = default
+        self._versions = {}  # version -> ModelEntry
+        self._latest = {}    # name -> version
+        self._history = {}   # name -> [version, ...] oldest first
+        self._seen = {}      # path -> (mtime, size)
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self.swap_listeners = []
+
+    def path_for(self, name):
+        return os.path.join(self.model_dir, f"{name}.pkl")
+
+    def _scorer(self, name, version, model):
+        """Exported scorer if it was built from this exact artifact, else compiled in-process."""
+        if not FAST_SCORER:
+            return None
+        scorer = None
+        scorer_path = os.path.join(self.model_dir, f"{name}{SCORER_SUFFIX}")
+        if os.path.exists(scorer_path):
+            exported, source_version = load_scorer(scorer_path)
+            if source_version == version:
+                scorer = exported
+        if scorer is None:
+            scorer = compile_model(model)
+        if scorer is not None and not agrees(scorer, model, len(FEATURES)):
+            print(f"Fast scorer for {name} disagrees with sklearn; using the model directly")
+            return None
+        return scorer
+
+    def _load(self, name, path):
+        version = artifact_version(path)
+        if version in self._versions:
+            return self._versions[version], False
+        model = joblib.load(path, mmap_mode="r")
+        entry = ModelEntry(name, version, model, path, self._scorer(name, version, model))
+
+        history = self._history.get(name, []) + [version]
+        evicted = history[:-KEEP_VERSIONS]
+        versions = dict(self._versions)
+        versions[version] = entry
+        for old in evicted:
+            versions.pop(old, None)
+        latest = dict(self._latest)
+        latest[name] = version
+
+        # publish the new maps with single reference assignments
+        self._versions = versions
+        self._history = {**self._history, name: history[-KEEP_VERSIONS:]}
+        self._latest = latest
+        return entry, True
+
+    def refresh(self):
+        """Load any model file that is new or changed on disk. Returns the names swapped in."""
+        swapped = []
+        with self._reload_lock:
+            for name in self.names:
+                path = self.path_for(name)
+                if not os.path.exists(path):
+                    continue
+                st = os.stat(path)
+                stamp = (st.st_mtime, st.st_size)
+                if self._seen.get(path) == stamp:
+                    continue
+                try:
+                    entry, changed = self._load(name, path)
+                except Exception as exc:
+                    print(f"Could not load {path}: {exc}")
+                    continue
+                self._seen[path] = stamp
+                if changed:
+                    print(f"Loaded {name} version {entry.version}")
+                    swapped.append(name)
+        if self.active_name in swapped:
+            for fn in self.swap_listeners:
+                try:
+                    fn(self.active())
+                except Exception as exc:
+                    print(f"model swap listener failed: {exc}")
+        return swapped
+
+    def get(self, name=None, version=None):
+        """Entry for a pinned version, a named model's latest version, or the active model."""
+        if version is not None:
+            entry = self._versions.get(version)
+            if entry is None:
+                raise KeyError(f"model version {version} is not loaded")
+            return entry
+        name = name or self.active_name
+        latest = self._latest.get(name)
+        if latest is None:
+            raise KeyError(f"model {name} is not loaded")
+        return self._versions[latest]
+
+    def active(self):
+        return self.get()
+
+    def set_active(self, name):
+        self.get(name)
+        self.active_name = name
+        for fn in self.swap_listeners:
+            fn(self.active())
+
+    def list(self):
+        return {
+            "active": self.active_name,
+            "latest": dict(self._latest),
+            "versions": [e.to_dict() for e in self._versions.values()],
+        }
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.refresh()
+            except Exception as exc:
+                print(f"model watcher failed: {exc}")
+
+    def start_watcher(self, interval=POLL_INTERVAL_S):
+        if self._watcher is None and interval > 0:
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+            self._watcher.start()
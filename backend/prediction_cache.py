@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "10000"))
+CACHE_TTL_S = float(os.environ.get("PREDICTION_CACHE_TTL_S", "300"))
+CACHE_QUANTUM = float(os.environ.get("PREDICTION_CACHE_QUANTUM", "1e-6"))
+
+
+class PredictionCache:
+    """Bounded LRU + TTL cache of predictions keyed on (model version, quantized features).
+
+    Feature values are rounded to multiples of `quantum` before hashing,
+    so vectors that differ only by less than that share an entry. A size
+    of 0 disables the cache.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl_s=CACHE_TTL_S, quantum=CACHE_QUANTUM):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.quantum = quantum
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def key(self, version, row):
+        q = np.round(np.asarray(row, dtype=np.float64) / self.quantum).astype(np.int64)
+        return version, q.tobytes()
+
+    def get(self, version, row):
+        if not self.enabled:
+            return None
+        k = self.key(version, row)
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(k)
+            if item is None:
+                self.misses += 1
+                return None
+            value, expires = item
+            if expires < now:
+                del self._data[k]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(k)
+            self.hits += 1
+            return value
+
+    def put(self, version, row, value):
+        if not self.enabled:
+            return
+        k = self.key(version, row)
+        with self._lock:
+            self._data[k] = (value, time.monotonic() + self.ttl_s)
+            self._data.move_to_end(k)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, *_):
+        """Drop every entry; registered as a model swap listener."""
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "quantum": self.quantum,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -1,24 +1,262 @@
-import pandas as pd
+import atexit
+import json
 import os
+import sqlite3
+import threading
+import time
+from collections import deque
 from datetime import datetime
-import json
 
-LOG_FILE = "recent_predictions.csv"
+import pandas as pd
+
+from features import FEATURES
+from metrics import log_flush_rows, log_flush_seconds, stage_seconds
+
+DB_FILE = os.environ.get("PREDICTION_DB", "predictions.db")
+FLUSH_MAX_ROWS = int(os.environ.get("LOG_FLUSH_MAX_ROWS", "512"))
+FLUSH_INTERVAL_S = float(os.environ.get("LOG_FLUSH_INTERVAL_S", "0.5"))
+BUFFER_CAPACITY = int(os.environ.get("LOG_BUFFER_CAPACITY", "100000"))
+
+COLUMNS = FEATURES + ["prediction", "timestamp"]
+
+
+def connect(path=DB_FILE):
+    # every serving worker writes to the same file; wait out their write locks
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    cols = ", ".join(f"{f} REAL" for f in FEATURES)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS predictions ("
+        f"id INTEGER PRIMARY KEY AUTOINCREMENT, {cols}, prediction INTEGER, timestamp TEXT)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp)")
+    return conn
+
+
+class PredictionLog:
+    """Ring buffer of predictions flushed to SQLite by a background thread.
+
+    `append`/`extend` only touch an in-memory deque, so the request path
+    never waits on disk. The writer thread flushes when FLUSH_MAX_ROWS rows
+    are pending or FLUSH_INTERVAL_S has elapsed, whichever comes first. If
+    the writer falls behind by more than BUFFER_CAPACITY rows the oldest
+    pending rows are dropped and counted in `dropped`.
+    """
+
+    def __init__(self, path=DB_FILE, max_rows=FLUSH_MAX_ROWS,
+                 interval=FLUSH_INTERVAL_S, capacity=BUFFER_CAPACITY):
+        self.path = path
+        self.max_rows = max_rows
+        self.interval = interval
+        self._buffer = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._conn = None
+        self.latest = None
+        self.append_listeners = []
+        self.dropped = 0
+        self.flushed = 0
+        self.last_flush_s = 0.0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+                    self._thread.start()
+
+    def _push(self, row):
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(row)
+
+    def append(self, row):
+        self._ensure_started()
+        with self._lock:
+            self._push(row)
+            self.latest = row
+        if len(self._buffer) >= self.max_rows:
+            self._wake.set()
+        self._notify(row)
+
+    def extend(self, rows):
+        if not rows:
+            return
+        self._ensure_started()
+        with self._lock:
+            for row in rows:
+                self._push(row)
+            self.latest = rows[-1]
+        if len(self._buffer) >= self.max_rows:
+            self._wake.set()
+        # batches only announce their last row; listeners want "what's new", not every row
+        self._notify(rows[-1])
+
+    def _notify(self, row):
+        for fn in self.append_listeners:
+            try:
+                fn(row)
+            except Exception as exc:
+                print(f"prediction log append listener failed: {exc}")
+
+    def flush(self):
+        """Write every pending row to disk. Safe to call from any thread."""
+        with self._write_lock:
+            with self._lock:
+                rows = list(self._buffer)
+                self._buffer.clear()
+            if not rows:
+                return 0
+            started = time.perf_counter()
+            if self._conn is None:
+                self._conn = connect(self.path)
+            placeholders = ", ".join("?" for _ in COLUMNS)
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO predictions ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                    [tuple(r.get(c) for c in COLUMNS) for r in rows],
+                )
+            self.flushed += len(rows)
+            self.last_flush_s = time.perf_counter() - started
+            log_flush_seconds.observe(self.last_flush_s)
+            log_flush_rows.inc(amount=len(rows))
+            # also write a small latest JSON for quick access
+            try:
+                with open('latest_prediction.json', 'w') as f:
+                    json.dump(rows[-1], f, default=str)
+            except Exception:
+                pass
+            return len(rows)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as exc:
+                print(f"prediction log flush failed: {exc}")
+
+    def pending(self):
+        return len(self._buffer)
+
+
+prediction_log = PredictionLog()
+atexit.register(prediction_log.flush)
+
 
 def log_prediction(features, prediction):
-    row = features.copy()
-    row["prediction"] = prediction
-    row["timestamp"] = datetime.utcnow()
+    with stage_seconds.time("predict", "log"):
+        row = features.copy()
+        row["prediction"] = prediction
+        row["timestamp"] = datetime.utcnow().isoformat()
+        prediction_log.append(row)
+
+
+def log_predictions(x, predictions, columns):
+    """Queue a whole batch of predictions in one go."""
+    if len(x) == 0:
+        return
+    with stage_seconds.time("predict_batch", "log"):
+        ts = datetime.utcnow().isoformat()
+        rows = [dict(zip(columns, r)) for r in x.tolist()]
+        for row, p in zip(rows, predictions):
+            row["prediction"] = int(p)
+            row["timestamp"] = ts
+        prediction_log.extend(rows)
+
+
+def read_predictions():
+    """Return every logged prediction (including unflushed ones) as a DataFrame."""
+    prediction_log.flush()
+    if not os.path.exists(prediction_log.path):
+        return pd.DataFrame(columns=COLUMNS)
+    conn = connect(prediction_log.path)
+    try:
+        return pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM predictions ORDER BY id", conn)
+    finally:
+        conn.close()
+
+
+def read_since(after_id=0, chunksize=50000):
+    """Yield (records, last_id) for every row with id > after_id, oldest first.
+
+    Serving workers share the database but not their buffers, so this is
+    how one process sees predictions logged by the others. Only the new
+    rows are read, via the primary key.
+    """
+    prediction_log.flush()
+    if not os.path.exists(prediction_log.path):
+        return
+    conn = connect(prediction_log.path)
+    try:
+        query = f"SELECT id, {', '.join(COLUMNS)} FROM predictions WHERE id > ? ORDER BY id"
+        for chunk in pd.read_sql_query(query, conn, params=[int(after_id)], chunksize=chunksize):
+            if chunk.empty:
+                break
+            yield chunk.drop(columns=["id"]).to_dict(orient="records"), int(chunk["id"].iloc[-1])
+    finally:
+        conn.close()
+
+
+def latest_since(after_id=0):
+    """(row, id) of the newest prediction with id > after_id, or (None, after_id)."""
+    if not os.path.exists(prediction_log.path):
+        return None, after_id
+    conn = connect(prediction_log.path)
+    try:
+        cur = conn.execute(
+            f"SELECT id, {', '.join(COLUMNS)} FROM predictions WHERE id > ? ORDER BY id DESC LIMIT 1",
+            (int(after_id),),
+        )
+        found = cur.fetchone()
+    finally:
+        conn.close()
+    if found is None:
+        return None, after_id
+    return dict(zip(COLUMNS, found[1:])), found[0]
+
+
+def query_predictions(limit=100, cursor=None, since=None, until=None):
+    """A page of logged predictions, oldest first, plus the cursor for the next page.
 
-    df = pd.DataFrame([row])
+    With a cursor (the id of the last row seen) or `since`, rows are read
+    forward from there; otherwise the last `limit` rows are returned.
+    Either way only the requested rows are read, via the primary key or
+    the timestamp index.
+    """
+    prediction_log.flush()
+    if not os.path.exists(prediction_log.path):
+        return [], cursor
+    where, params = [], []
+    if cursor is not None:
+        where.append("id > ?")
+        params.append(int(cursor))
+    if since is not None:
+        where.append("timestamp >= ?")
+        params.append(pd.Timestamp(since).isoformat())
+    if until is not None:
+        where.append("timestamp < ?")
+        params.append(pd.Timestamp(until).isoformat())
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+    forward = cursor is not None or since is not None
+    order = "ASC" if forward else "DESC"
+    sql = f"SELECT id, {', '.join(COLUMNS)} FROM predictions {clause} ORDER BY id {order} LIMIT ?"
 
-    if not os.path.exists(LOG_FILE):
-        df.to_csv(LOG_FILE, index=False)
-    else:
-        df.to_csv(LOG_FILE, mode="a", header=False, index=False)
-    # also write a small latest JSON for quick access
+    conn = connect(prediction_log.path)
     try:
-        with open('latest_prediction.json', 'w') as f:
-            json.dump({k: (str(v) if isinstance(v, (datetime,)) else v) for k,v in row.items()}, f, default=str)
-    except Exception:
-        pass
\ No newline at end of file
+        df = pd.read_sql_query(sql, conn, params=params + [int(limit)])
+        if df.empty and not forward:
+            last = conn.execute("SELECT MAX(id) FROM predictions").fetchone()[0]
+    finally:
+        conn.close()
+    if not forward:
+        df = df.iloc[::-1]
+    if df.empty:
+        return [], cursor if forward else last
+    next_cursor = int(df["id"].max())
+    df = df.drop(columns=["id"]).astype(object)
+    return df.where(df.notna(), None).to_dict(orient="records"), next_cursor
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import Pipeline
+
+from features import FEATURES
+
+CATEGORICAL_FEATURES = [
+    "gender", "family_diabetes", "hypertensive",
+    "family_hypertension", "cardiovascular_disease", "stroke"
+]
+
+
+def encoder_of(model):
+    """The CategoricalEncoder step of a serving pipeline, or None."""
+    if type(model).__name__ == "Pipeline":
+        return model.named_steps.get("encode")
+    return None
+
+
+class CategoricalEncoder(BaseEstimator, TransformerMixin):
+    """Label-encode categorical columns and emit features in FEATURES order.
+
+    Codes follow LabelEncoder (sorted class index), so clients that already
+    send 0/1 codes are passed through unchanged. Numeric ndarray input is
+    assumed to be encoded already and returned as-is.
+    """
+
+    def __init__(self, columns=CATEGORICAL_FEATURES):
+        self.columns = columns
+
+    def fit(self, X, y=None):
+        self.classes_ = {c: np.unique(X[c].astype(str)) for c in self.columns if c in X}
+        return self
+
+    def code(self, column, value):
+        """Code for one value of `column`; numbers and numeric strings pass through as codes."""
+        if not isinstance(value, str):
+            return float(value)
+        classes = self.classes_.get(column)
+        if classes is not None:
+            i = int(np.searchsorted(classes, value))
+            if i < len(classes) and classes[i] == value:
+                return float(i)
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(f"unknown {column} value {value!r}") from None
+
+    def encode_frame(self, df):
+        df = df.copy()
+        for c, classes in self.classes_.items():
+            if c in df and not pd.api.types.is_numeric_dtype(df[c]):
+                lookup = {v: i for i, v in enumerate(classes)}
+                df[c] = df[c].astype(str).map(lookup)
+        return df
+
+    def transform(self, X):
+        if hasattr(X, "columns"):
+            return self.encode_frame(X)[FEATURES].to_numpy(dtype=float)
+        return np.asarray(X, dtype=float)
+
+
+def serving_pipeline(model, scaler=None, encoder=None):
+    """Chain already-fitted preprocessing steps and a model into one artifact.
+
+    Nothing is refit; the result scores raw feature rows in FEATURES order.
+    """
+    steps = []
+    if encoder is not None:
+        steps.append(("encode", encoder))
+    if scaler is not None:
+        steps.append(("scale", scaler))
+    steps.append(("model", model))
+    return Pipeline(steps)
@@ -0,0 +1,75 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURES
+from drift_stats import N_BINS
+
+PROFILE_FILE = "reference_profile.npz"
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+def build_profile(df, model_version="", n_bins=N_BINS):
+    """Summarise a reference frame into per-feature statistics.
+
+    Features that are missing or non-numeric in df get NaN moments and a
+    dummy 0..1 histogram so every array stays aligned with FEATURES.
+    """
+    n = len(FEATURES)
+    x = np.full((len(df), n), np.nan)
+    for j, f in enumerate(FEATURES):
+        if f in df.columns:
+            x[:, j] = pd.to_numeric(df[f], errors="coerce").to_numpy(dtype=float)
+
+    present = ~np.isnan(x).all(axis=0)
+    count = (~np.isnan(x)).sum(axis=0)
+    mean = np.full(n, np.nan)
+    variance = np.full(n, np.nan)
+    quantiles = np.full((n, len(QUANTILES)), np.nan)
+    edges = np.tile(np.linspace(0.0, 1.0, n_bins + 1), (n, 1))
+    hist = np.zeros((n, n_bins), dtype=np.int64)
+
+    for j in np.flatnonzero(present):
+        col = x[:, j][~np.isnan(x[:, j])]
+        mean[j] = col.mean()
+        variance[j] = col.var(ddof=1) if len(col) > 1 else 0.0
+        quantiles[j] = np.quantile(col, QUANTILES)
+        lo, hi = col.min(), col.max()
+        edges[j] = np.linspace(lo, hi if hi > lo else lo + 1.0, n_bins + 1)
+        hist[j] = np.histogram(col, bins=edges[j])[0]
+
+    return {
+        "features": np.array(FEATURES),
+        "count": count,
+        "mean": mean,
+        "variance": variance,
+        "quantile_levels": np.array(QUANTILES),
+        "quantiles": quantiles,
+        "hist_edges": edges,
+        "hist_counts": hist,
+        "model_version": np.array(model_version or ""),
+        "created_at": np.array(datetime.utcnow().isoformat()),
+    }
+
+
+def save_profile(profile, path=PROFILE_FILE):
+    # write to a temp file first so readers never see a partial profile
+    tmp = f"{path}.tmp.npz"
+    np.savez(tmp, **profile)
+    os.replace(tmp, path)
+
+
+def load_profile(path=PROFILE_FILE):
+    with np.load(path, allow_pickle=False) as data:
+        profile = {k: data[k] for k in data.files}
+    if list(profile["features"]) != FEATURES:
+        raise ValueError(f"{path} was built for a different feature set")
+    profile["model_version"] = str(profile["model_version"])
+    profile["created_at"] = str(profile["created_at"])
+    return profile
+
+
+def means(profile):
+    return {f: float(m) for f, m in zip(FEATURES, profile["mean"]) if not np.isnan(m)}
@@ -0,0 +1,38 @@
+from typing import List, Union
+
+from pydantic import BaseModel, Field, create_model
+
+from features import FEATURES
+from preprocessing import CATEGORICAL_FEATURES
+
+
+class _Row:
+    def row(self):
+        """Feature values in FEATURES order, ready to copy into a model input buffer."""
+        return tuple(getattr(self, f) for f in FEATURES)
+
+    def record(self):
+        return dict(zip(FEATURES, self.row()))
+
+
+# One typed field per feature, generated from FEATURES so the schema can never
+# drift from the column order the models were trained on. Categorical
+# features take either the category ("Male", "Yes") or its numeric code;
+# the serving model's encoder maps categories to codes (inference.encode_row).
+PredictionRequest = create_model(
+    "PredictionRequest",
+    __base__=(_Row, BaseModel),
+    **{f: (Union[float, str] if f in CATEGORICAL_FEATURES else float, ...) for f in FEATURES},
+)
+
+
+class PositionalRequest(_Row, BaseModel):
+    """Compact payload: {"features": [14 numbers in FEATURES order]}, categoricals as codes."""
+
+    features: List[float] = Field(..., min_length=len(FEATURES), max_length=len(FEATURES))
+
+    def row(self):
+        return tuple(self.features)
+
+
+PredictRequest = Union[PredictionRequest, PositionalRequest]
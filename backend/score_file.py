@@ -0,0 +1,251 @@
+"""Score a large CSV or Parquet file offline with a registered model.
+
+The input is cut into tasks: byte ranges aligned to line starts for CSV,
+runs of row groups for Parquet. Each worker process reads its own slice
+straight from disk, scores it, and writes a part file. Nothing is parsed
+or pickled centrally, so throughput scales with cores. Workers load the
+model once, through the same registry, fast-path scorer and categorical
+encoding as the API. The parent appends finished parts to the output in
+input order and deletes them, so memory stays bounded at about one
+slice per worker.
+
+CSV slicing assumes no quoted field contains a newline.
+
+Usage: python score_file.py INPUT OUTPUT [--model NAME] [--workers N] [--chunk-mb N]
+       INPUT and OUTPUT must share a format: .csv or .parquet (Parquet needs pyarrow).
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURES
+from model_registry import DEFAULT_MODEL, MODEL_DIR, ModelRegistry
+
+CHUNK_MB = 64
+# rows scored per call: the forest scorer's temporaries are (rows x trees), so a
+# whole 64 MB slice (~1M rows) would need several GB per worker
+SCORE_BATCH_ROWS = 16384
+
+_entry = None
+
+
+def _load_model(name, model_dir):
+    global _entry
+    registry = ModelRegistry(model_dir=model_dir, names=[name], default=name)
+    registry.refresh()
+    _entry = registry.get(name)
+
+
+def _features(df):
+    """(n, 14) float matrix in FEATURES order; rows that cannot be parsed are NaN."""
+    model = _entry.model
+    if type(model).__name__ == "Pipeline" and "encode" in model.named_steps:
+        df = model.named_steps["encode"].encode_frame(df)
+    return np.column_stack([pd.to_numeric(df[f], errors="coerce").to_numpy(dtype=float) for f in FEATURES])
+
+
+def score_frame(df, columns=None, with_proba=True):
+    """df (or its `columns`) plus prediction and probability; both empty where a row is invalid."""
+    missing = [f for f in FEATURES if f not in df.columns]
+    if missing:
+        raise ValueError(f"input is missing features: {', '.join(missing)}")
+    x = _features(df)
+    valid = ~np.isnan(x).any(axis=1)
+    pred = np.full(len(x), np.nan)
+    proba = np.full(len(x), np.nan) if with_proba else None
+    if valid.any():
+        predictor = _entry.predictor
+        rows = np.flatnonzero(valid)
+        for start in range(0, len(rows), SCORE_BATCH_ROWS):
+            batch = rows[start:start + SCORE_BATCH_ROWS]
+            xv = x[batch]
+            pred[batch] = predictor.predict(xv)
+            if proba is not None:
+                try:
+                    proba[batch] = predictor.predict_proba(xv)[:, 1]
+                except (AttributeError, NotImplementedError):
+                    # e.g. SVC trained without probability=True
+                    proba = None
+    out = (df[columns] if columns is not None else df).assign(prediction=pd.array(pred, dtype="Int64"))
+    if proba is not None:
+        out = out.assign(probability=proba)
+    return out, int((~valid).sum())
+
+
+def _line_start(f, pos, data_start):
+    if pos <= data_start:
+        return data_start
+    f.seek(pos - 1)
+    f.readline()
+    return f.tell()
+
+
+def csv_slices(path, chunk_bytes):
+    """Header bytes and (start, end) byte ranges that each begin at a line start."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        bounds = sorted({_line_start(f, p, data_start) for p in range(data_start, size, chunk_bytes)} | {size})
+    return header, list(zip(bounds[:-1], bounds[1:]))
+
+
+def score_csv_slice(src, header, start, end, part, columns, with_proba):
+    with open(src, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # low_memory=False: one dtype per column for the whole slice
+    df = pd.read_csv(io.BytesIO(header + data), low_memory=False)
+    out, invalid = score_frame(df, columns, with_proba)
+    lines = [line for line in data.splitlines() if line] if columns is None else None
+    if lines is None or len(lines) != len(out):
+        out.to_csv(part, index=False)
+        return len(out), invalid
+    # every input column is kept: reuse the input bytes and only format the new columns,
+    # which is most of the cost of writing the slice
+    added = out.iloc[:, len(df.columns):].to_csv(index=False).encode().splitlines()
+    with open(part, "wb") as f:
+        f.write(header.rstrip(b"\r\n") + b"," + added[0] + b"\n")
+        f.write(b"".join(line + b"," + extra + b"\n" for line, extra in zip(lines, added[1:])))
+    return len(out), invalid
+
+
+def parquet_slices(path, chunk_bytes):
+    """Runs of consecutive row groups of roughly chunk_bytes (uncompressed) each."""
+    import pyarrow.parquet as pq
+    meta = pq.ParquetFile(path).metadata
+    slices, current, size = [], [], 0
+    for i in range(meta.num_row_groups):
+        current.append(i)
+        size += meta.row_group(i).total_byte_size
+        if size >= chunk_bytes:
+            slices.append(current)
+            current, size = [], 0
+    if current:
+        slices.append(current)
+    return slices
+
+
+def score_parquet_slice(src, row_groups, part, columns, with_proba):
+    import pyarrow.parquet as pq
+    df = pq.ParquetFile(src).read_row_groups(row_groups).to_pandas()
+    out, invalid = score_frame(df, columns, with_proba)
+    out.to_parquet(part, index=False)
+    return len(out), invalid
+
+
+class _PartAppender:
+    """Concatenates finished part files into the output, in order."""
+
+    def __init__(self, dst, parquet):
+        self.parquet = parquet
+        self._file = open(dst, "wb")
+        self._writer = None
+        self._parts = 0
+
+    def append(self, part):
+        if self.parquet:
+            import pyarrow.parquet as pq
+            pf = pq.ParquetFile(part)
+            for i in range(pf.metadata.num_row_groups):
+                table = pf.read_row_group(i)
+                if self._writer is None:
+                    self._writer = pq.ParquetWriter(self._file, table.schema)
+                self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            with open(part, "rb") as f:
+                if self._parts:
+                    f.readline()  # every part carries the header; keep the first only
+                shutil.copyfileobj(f, self._file, 1 << 20)
+        self._parts += 1
+        os.remove(part)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._file.close()
+
+
+def score_file(src, dst, name=DEFAULT_MODEL, model_dir=MODEL_DIR, workers=None,
+               chunk_mb=CHUNK_MB, columns=None, with_proba=True):
+    """Score src into dst and return a summary dict."""
+    parquet = src.endswith(".parquet")
+    if parquet != dst.endswith(".parquet"):
+        raise ValueError("input and output must both be .csv or both be .parquet")
+    workers = workers or os.cpu_count() or 1
+    _load_model(name, model_dir)
+    version = _entry.version
+    started = time.perf_counter()
+    chunk_bytes = chunk_mb * 1024 * 1024
+    rows = invalid = 0
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(dst))) as tmp:
+        if parquet:
+            tasks = [(score_parquet_slice, (src, groups)) for groups in parquet_slices(src, chunk_bytes)]
+        else:
+            header, ranges = csv_slices(src, chunk_bytes)
+            tasks = [(score_csv_slice, (src, header, start, end)) for start, end in ranges]
+        out = _PartAppender(dst, parquet)
+        try:
+            with ProcessPoolExecutor(workers, initializer=_load_model, initargs=(name, model_dir)) as pool:
+                # keep at most two slices per worker in flight
+                futures, next_task = [], 0
+                for i in range(len(tasks)):
+                    while next_task < len(tasks) and next_task < i + 2 * workers:
+                        fn, args = tasks[next_task]
+                        part = os.path.join(tmp, f"part-{next_task:06d}")
+                        futures.append((part, pool.submit(fn, *args, part, columns, with_proba)))
+                        next_task += 1
+                    part, future = futures[i]
+                    n, bad = future.result()
+                    rows += n
+                    invalid += bad
+                    out.append(part)
+        finally:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "model": name,
+        "model_version": version,
+        "rows": rows,
+        "invalid_rows": invalid,
+        "workers": workers,
+        "tasks": len(tasks),
+        "elapsed_s": elapsed,
+        "rows_per_s": rows / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file with a registered model.")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="scoring processes (default: all cores)")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_MB, help="input size handled per task")
+    parser.add_argument("--columns", help="comma-separated input columns to copy to the output (default: all)")
+    parser.add_argument("--no-proba", action="store_true", help="skip the probability column")
+    args = parser.parse_args()
+
+    columns = args.columns.split(",") if args.columns else None
+    summary = score_file(args.input, args.output, args.model, args.model_dir, args.workers,
+                         args.chunk_mb, columns, not args.no_proba)
+    print(f"Scored {summary['rows']} rows with {summary['model']}@{summary['model_version']} "
+          f"in {summary['elapsed_s']:.1f}s ({summary['rows_per_s']:,.0f} rows/s, {summary['workers']} workers)")
+    if summary["invalid_rows"]:
+        print(f"{summary['invalid_rows']} rows had missing or non-numeric features and were not scored")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
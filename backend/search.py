@@ -0,0 +1,233 @@
+"""Hyperparameter search by successive halving over a process pool.
+
+Every family gets TRAIN_SEARCH_TRIALS random configurations. Rung 0 fits
+them all on a small slice of each cross-validation fold; only the best
+1/ETA of each family advance to the next rung, which gets ETA times the
+rows, until the survivors see full folds. Most of the compute therefore
+goes to the promising configurations, and a wall-clock budget stops the
+search between (or during) rungs with the best scores reached so far:
+queued trials are cancelled and running ones give up at their next fold,
+so the overrun is at most one fold fit. The overall winner is picked at
+the highest rung every trial finished, so families are compared on the
+same number of rows.
+
+The training matrix and the fold indices are joblib files that every
+worker memory-maps, so all trials share one copy in RAM.
+"""
+import itertools
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from train_engine import TRAIN_WORKERS, StageTimer
+
+SEARCH_TRIALS = int(os.environ.get("TRAIN_SEARCH_TRIALS", "27"))
+SEARCH_BUDGET_S = float(os.environ.get("TRAIN_SEARCH_BUDGET_S", "600"))
+ETA = 3
+CV_FOLDS = 3
+MIN_ROWS = 200  # smallest training slice a rung-0 trial sees
+
+SCORERS = {
+    "f1": f1_score,
+    "accuracy": accuracy_score,
+    "roc_auc": roc_auc_score,
+}
+
+
+def log_uniform(low, high):
+    return lambda rng: float(math.exp(rng.uniform(math.log(low), math.log(high))))
+
+
+def randint(low, high):
+    return lambda rng: int(rng.integers(low, high + 1))
+
+
+# name -> parameter -> list of choices, or a sampler taking a numpy Generator
+SPACES = {
+    "LogisticRegression": {
+        "C": log_uniform(1e-3, 1e2),
+        "class_weight": [None, "balanced"],
+    },
+    "SVM": {
+        "C": log_uniform(1e-1, 1e2),
+        "gamma": log_uniform(1e-3, 1.0),
+        "class_weight": [None, "balanced"],
+    },
+    "RandomForest": {
+        "n_estimators": randint(50, 400),
+        "max_depth": [4, 6, 8, 10, 14, 20, None],
+        "min_samples_leaf": randint(1, 8),
+        "max_features": ["sqrt", "log2", None],
+    },
+}
+
+
+def sample(space, rng):
+    params = {}
+    for key, spec in space.items():
+        params[key] = spec(rng) if callable(spec) else spec[int(rng.integers(len(spec)))]
+    return params
+
+
+def cache_folds(data_path, n_folds=CV_FOLDS, seed=42):
+    """Stratified fold indices for the training split in data_path, cached next to it.
+
+    Training indices are shuffled once, so any prefix of them is a random
+    subsample; a rung's slice is a prefix, and each rung's rows contain
+    the previous rung's.
+    """
+    cache_dir, name = os.path.split(data_path)
+    key = name[len("prepared-"):-len(".joblib")]
+    path = os.path.join(cache_dir, f"folds-{key}-k{n_folds}-s{seed}.joblib")
+    if os.path.exists(path):
+        return path
+    y = joblib.load(data_path, mmap_mode="r")["y_train"]
+    rng = np.random.default_rng(seed)
+    folds = [(rng.permutation(train), val)
+             for train, val in StratifiedKFold(n_folds, shuffle=True, random_state=seed).split(np.zeros(len(y)), y)]
+    tmp = path + ".tmp"
+    joblib.dump(folds, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def _evaluate(estimator, data_path, folds_path, fraction, metric, deadline=None):
+    """Mean cross-validated score and seconds spent; the score is None if `deadline` (epoch seconds) passed."""
+    data = joblib.load(data_path, mmap_mode="r")
+    folds = joblib.load(folds_path, mmap_mode="r")
+    X, y = data["X_train"], data["y_train"]
+    score = SCORERS[metric]
+    started = time.perf_counter()
+    scores = []
+    for train, val in folds:
+        if deadline is not None and time.time() >= deadline:
+            return None, time.perf_counter() - started
+        rows = train[:max(MIN_ROWS, int(len(train) * fraction))]
+        model = clone(estimator).fit(X[rows], y[rows])
+        if metric == "roc_auc":
+            pred = model.decision_function(X[val]) if hasattr(model, "decision_function") \
+                else model.predict_proba(X[val])[:, 1]
+        else:
+            pred = model.predict(X[val])
+        scores.append(score(y[val], pred))
+    return float(np.mean(scores)), time.perf_counter() - started
+
+
+def _trial_estimator(base, params):
+    estimator = clone(base).set_params(**params)
+    extra = estimator.get_params()
+    if "n_jobs" in extra:
+        estimator.set_params(n_jobs=1)  # the pool already runs one trial per core
+    if extra.get("probability"):
+        # trials only predict; Platt scaling's internal CV would multiply every fit
+        estimator.set_params(probability=False)
+    return estimator
+
+
+def search(candidates, data_path, n_trials=SEARCH_TRIALS, budget_s=SEARCH_BUDGET_S, eta=ETA,
+           n_folds=CV_FOLDS, metric="f1", workers=TRAIN_WORKERS, spaces=SPACES, seed=42, timer=None):
+    """Tune every estimator in `candidates` (name -> unfitted base estimator) by successive halving.
+
+    Sampled parameters from spaces[name] override the base estimator's.
+    Returns a dict with the best parameters and score per name, the
+    overall winner (None if no trial finished) with the rung it was
+    picked at, and the full list of trials, each with its
+    cross-validated score at every rung it reached.
+    """
+    timer = timer or StageTimer()
+    with timer.stage("search folds"):
+        folds_path = cache_folds(data_path, n_folds, seed)
+    n_rows = len(joblib.load(data_path, mmap_mode="r")["y_train"]) * (n_folds - 1) / n_folds
+    rungs = int(math.log(max(n_trials, 1), eta)) + 1
+    rng = np.random.default_rng(seed)
+
+    trials = []
+    alive = {}
+    for name in candidates:
+        alive[name] = []
+        for _ in range(n_trials):
+            trial = {"model": name, "trial": len(alive[name]), "params": sample(spaces[name], rng),
+                     "rung": -1, "scores": [], "fractions": [], "seconds": 0.0}
+            trials.append(trial)
+            alive[name].append(trial)
+
+    deadline = time.monotonic() + budget_s
+    # the workers' copy of the deadline: wall-clock time is the same in every process
+    wall_deadline = time.time() + budget_s
+    completed = -1  # highest rung whose trials all finished
+    # spawn: the caller's tracking uploader thread would not survive a fork safely
+    pool = ProcessPoolExecutor(max(1, workers), mp_context=multiprocessing.get_context("spawn"))
+    with timer.stage("search (wall)"), pool:
+        for rung in range(rungs):
+            if time.monotonic() >= deadline:
+                print(f"Search budget of {budget_s:.0f}s spent after {rung} rungs")
+                break
+            fraction = min(1.0, max(eta ** (rung - rungs + 1), MIN_ROWS / n_rows))
+            futures = {}
+            # interleave families, so a budget cut mid-rung leaves every family some results
+            for group in itertools.zip_longest(*alive.values()):
+                for trial in filter(None, group):
+                    estimator = _trial_estimator(candidates[trial["model"]], trial["params"])
+                    futures[pool.submit(_evaluate, estimator, data_path, folds_path, fraction, metric,
+                                        wall_deadline)] = trial
+            pending, stopped = set(futures), set()
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    trial = futures[future]
+                    score, seconds = future.result()
+                    trial["seconds"] += seconds
+                    if score is None:
+                        stopped.add(future)  # gave up at the deadline
+                        continue
+                    trial["rung"] = rung
+                    trial["scores"].append(score)
+                    trial["fractions"].append(fraction)
+                if time.monotonic() >= deadline and pending:
+                    # out of time: unfinished trials keep the score of their last rung;
+                    # queued ones are cancelled, running ones stop at their next fold
+                    for future in pending:
+                        future.cancel()
+                    print(f"Search budget of {budget_s:.0f}s spent during rung {rung}")
+                    break
+            incomplete = bool(pending or stopped)
+            if not incomplete:
+                completed = rung
+            print(f"Rung {rung}: {len(futures)} trials on {fraction:.0%} of each fold")
+            for name in alive:
+                ranked = sorted((t for t in alive[name] if t["rung"] == rung),
+                                key=lambda t: t["scores"][-1], reverse=True)
+                alive[name] = ranked[:max(1, math.ceil(len(ranked) / eta))]
+            if incomplete:
+                break
+
+    best, scores = {}, {}
+    for name in candidates:
+        finished = [t for t in trials if t["model"] == name and t["scores"]]
+        if not finished:
+            print(f"No {name} trial finished within the budget; keeping its base parameters")
+            continue
+        # a score on more rows beats a (noisier) score on fewer
+        top = max(finished, key=lambda t: (t["rung"], t["scores"][-1]))
+        best[name], scores[name] = top["params"], top["scores"][-1]
+        print(f"{name}: best cv {metric} {scores[name]:.4f} with {top['params']}")
+
+    # across families, compare only scores measured on the same rows
+    rung = max(completed, 0)
+    finalists = [t for t in trials if len(t["scores"]) > rung]
+    winner = None
+    if finalists:
+        top = max(finalists, key=lambda t: t["scores"][rung])
+        winner = top["model"]
+        print(f"Best model: {winner} (cv {metric} {top['scores'][rung]:.4f} at rung {rung})")
+    return {"metric": metric, "best": best, "scores": scores, "winner": winner, "winner_rung": rung,
+            "trials": trials}
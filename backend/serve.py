@@ -0,0 +1,105 @@
+"""Preforking server for the API.
+
+The parent imports `app` once, which downloads and loads the models,
+compiles their fast scorers and reads the drift reference profile, then
+forks WEB_CONCURRENCY workers that all accept on one listening socket.
+Workers inherit those objects copy-on-write, and the joblib artifacts
+are memory-mapped, so the weights exist once in RAM however many
+workers run. Everything the workers write goes through process-safe
+stores: SQLite for predictions, locked appends for the CSV logs.
+
+Usage: python serve.py   (WEB_CONCURRENCY=1 runs a single in-process server)
+"""
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", "8000"))
+WORKERS = int(os.environ.get("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+RESTART_DELAY_S = 1.0
+
+
+def bind(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock):
+    # the parent's signal handlers are not ours; let uvicorn install its own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, lifespan="on"))
+    server.run(sockets=[sock])
+
+
+def spawn(app, sock):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, sock)
+        except BaseException as exc:
+            print(f"worker {os.getpid()} crashed: {exc}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    os.environ["SERVE_WORKERS"] = str(WORKERS)
+    sock = bind(HOST, PORT)
+
+    # load everything once, before forking
+    from app import app
+
+    if WORKERS <= 1:
+        uvicorn.Server(uvicorn.Config(app)).run(sockets=[sock])
+        return
+
+    # keep the loaded objects out of the collector's reach, so gc passes in
+    # the workers do not touch (and copy) the pages they share
+    gc.collect()
+    gc.freeze()
+
+    workers = {spawn(app, sock) for _ in range(WORKERS)}
+    print(f"Serving on {HOST}:{PORT} with {WORKERS} workers")
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            print(f"worker {pid} exited with status {status}; restarting")
+            time.sleep(RESTART_DELAY_S)
+            workers.add(spawn(app, sock))
+    sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
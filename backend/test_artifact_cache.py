@@ -0,0 +1,42 @@
+import os
+
+from artifact_cache import ArtifactCache, sha256_file
+
+
+def _artifact(path, payload):
+    with open(path, "wb") as f:
+        f.write(payload)
+    return str(path)
+
+
+def test_hit_returns_verified_copy(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    src = _artifact(tmp_path / "LogisticRegression.pkl", b"model v1")
+
+    assert cache.get("LogisticRegression", "v1") is None
+    cached = cache.put("LogisticRegression", "v1", src)
+
+    assert cache.get("LogisticRegression", "v1") == cached
+    assert sha256_file(cached) == sha256_file(src)
+    assert cache.latest("LogisticRegression") == ("v1", cached)
+
+
+def test_integrity_mismatch_is_a_miss(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    cached = cache.put("LogisticRegression", "v1", _artifact(tmp_path / "LogisticRegression.pkl", b"model v1"))
+    with open(cached, "ab") as f:
+        f.write(b"corrupt")
+
+    assert cache.get("LogisticRegression", "v1") is None
+    # the bad entry is dropped, so an offline start does not fall back to it
+    assert cache.latest("LogisticRegression") == (None, None)
+
+
+def test_least_recently_used_blob_is_evicted(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), max_bytes=20)
+    old = cache.put("RandomForest", "v1", _artifact(tmp_path / "a.pkl", b"x" * 12))
+    new = cache.put("RandomForest", "v2", _artifact(tmp_path / "b.pkl", b"y" * 12))
+
+    assert cache.get("RandomForest", "v1") is None
+    assert not os.path.exists(old)
+    assert cache.get("RandomForest", "v2") == new
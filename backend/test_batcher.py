@@ -0,0 +1,92 @@
+import asyncio
+
+from batcher import MicroBatcher
+
+
+def _sum_rows(x):
+    return x.sum(axis=1).tolist()
+
+
+def test_concurrent_rows_share_a_batch_and_get_their_own_result():
+    async def go():
+        b = MicroBatcher(_sum_rows, 2, max_wait_ms=20)
+        results = await asyncio.gather(*(b.submit([i, 1]) for i in range(10)))
+        return results, b.snapshot()
+
+    results, stats = asyncio.run(go())
+    assert results == [float(i + 1) for i in range(10)]
+    assert stats["requests"] == 10
+    assert stats["batches"] < 10
+
+
+def test_scoring_error_fails_the_batch_but_not_the_worker():
+    calls = []
+
+    def flaky(x):
+        calls.append(len(x))
+        if len(calls) == 1:
+            raise RuntimeError("model blew up")
+        return _sum_rows(x)
+
+    async def go():
+        b = MicroBatcher(flaky, 2, max_wait_ms=20)
+        failed = await asyncio.gather(b.submit([1, 1]), b.submit([2, 2]), return_exceptions=True)
+        return failed, await b.submit([3, 3]), b.snapshot()
+
+    failed, after, stats = asyncio.run(go())
+    assert all(isinstance(r, RuntimeError) for r in failed)
+    assert after == 6.0
+    assert stats["errors"] == 1
+
+
+def test_bad_row_fails_only_its_own_request():
+    async def go():
+        b = MicroBatcher(_sum_rows, 2, max_wait_ms=20)
+        results = await asyncio.gather(b.submit([1, 1]), b.submit(["Male", 1]), b.submit([1, 2, 3]),
+                                       b.submit([2, 2]), return_exceptions=True)
+        return results, await b.submit([5, 5])
+
+    results, after = asyncio.run(asyncio.wait_for(go(), 5))
+    assert results[0] == 2.0 and results[3] == 4.0
+    assert isinstance(results[1], ValueError) and isinstance(results[2], ValueError)
+    assert after == 10.0
+
+
+def test_close_answers_queued_rows_then_stops_the_worker():
+    async def go():
+        b = MicroBatcher(_sum_rows, 2, max_wait_ms=20)
+        await b.submit([0, 0])
+        worker = b._worker
+        pending = [asyncio.ensure_future(b.submit([i, i])) for i in range(3)]
+        await asyncio.sleep(0)  # let them reach the queue
+        b.close()
+        results = await asyncio.gather(*pending)
+        await asyncio.wait_for(worker, 1)
+        return results, worker
+
+    results, worker = asyncio.run(go())
+    assert results == [0.0, 2.0, 4.0]
+    assert worker.done() and not worker.cancelled()
+
+
+def test_close_stops_an_idle_worker():
+    async def go():
+        b = MicroBatcher(_sum_rows, 2)
+        await b.submit([1, 1])
+        b.close()
+        await asyncio.wait_for(b._worker, 1)
+        return b._worker
+
+    assert asyncio.run(go()).done()
+
+
+def test_row_submitted_after_close_is_still_answered():
+    # a request can resolve an evicted batcher just before batcher_for closes it
+    async def go():
+        b = MicroBatcher(_sum_rows, 2)
+        b.close()
+        result = await b.submit([1, 2])
+        await asyncio.wait_for(b._worker, 1)
+        return result
+
+    assert asyncio.run(go()) == 3.0
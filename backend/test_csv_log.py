@@ -0,0 +1,77 @@
+import os
+
+import pandas as pd
+
+import csv_log
+
+
+def _log(path, n, start="2024-01-01"):
+    times = pd.date_range(start, periods=n, freq="min")
+    for i, ts in enumerate(times):
+        csv_log.append_row(path, {"timestamp": ts, "value": i})
+    return times
+
+
+def test_page_walks_the_file_by_byte_offset(tmp_path):
+    path = str(tmp_path / "log.csv")
+    _log(path, 25)
+
+    seen, cursor = [], None
+    while True:
+        rows, cursor = csv_log.page(path, cursor, limit=10)
+        if not rows:
+            break
+        seen += [r["value"] for r in rows]
+    assert seen == list(range(25))
+    assert cursor == os.path.getsize(path)
+
+    # the cursor doubles as a poll position for rows appended later
+    csv_log.append_row(path, {"timestamp": "2024-01-02", "value": 99})
+    rows, _ = csv_log.page(path, cursor)
+    assert [r["value"] for r in rows] == [99]
+
+
+def test_page_stops_before_a_partial_row(tmp_path):
+    path = str(tmp_path / "log.csv")
+    _log(path, 3)
+    with open(path, "ab") as f:
+        f.write(b"2024-01-01 00:03:00,")  # a writer mid-row
+
+    rows, cursor = csv_log.page(path)
+    assert [r["value"] for r in rows] == [0, 1, 2]
+    rows, again = csv_log.page(path, cursor)
+    assert rows == [] and again == cursor
+
+
+def test_seek_time_finds_the_first_row_at_or_after(tmp_path):
+    path = str(tmp_path / "log.csv")
+    times = _log(path, 100)
+
+    for i in (0, 1, 37, 99):
+        rows, _ = csv_log.page(path, csv_log.seek_time(path, times[i]), limit=1)
+        assert rows[0]["value"] == i
+    # between two rows: the later one
+    rows, _ = csv_log.page(path, csv_log.seek_time(path, times[10] + pd.Timedelta("30s")), limit=1)
+    assert rows[0]["value"] == 11
+    assert csv_log.seek_time(path, "2023-01-01") == csv_log.page(path, limit=0)[1]
+    assert csv_log.seek_time(path, "2025-01-01") == os.path.getsize(path)
+
+
+def test_page_and_tail_honour_until(tmp_path):
+    path = str(tmp_path / "log.csv")
+    times = _log(path, 50)
+
+    rows, _ = csv_log.page(path, limit=100, until=times[20])
+    assert [r["value"] for r in rows] == list(range(20))
+    rows, cursor = csv_log.tail(path, 5, until=times[20])
+    assert [r["value"] for r in rows] == list(range(15, 20))
+    assert cursor == csv_log.seek_time(path, times[20])
+
+
+def test_append_follows_the_existing_header(tmp_path):
+    path = str(tmp_path / "observations.csv")
+    csv_log.append_row(path, {"b": 1}, columns=["a", "b"])
+    csv_log.append_row(path, {"a": 2, "c": 3})
+
+    rows, _ = csv_log.page(path)
+    assert rows == [{"a": None, "b": 1.0}, {"a": 2.0, "b": None}]
@@ -0,0 +1,77 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from fast_scorer import ForestScorer, LinearScorer, compile_model, load_scorer, save_scorer
+from preprocessing import serving_pipeline
+
+
+def _data(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal([50.0, 120.0, 25.0, 0.0], [15.0, 30.0, 5.0, 1.0], size=(n, 4))
+    X[:, 3] = X[:, 3] > 0  # a 0/1 column, like the encoded categoricals
+    y = (X[:, 1] + 2 * X[:, 2] + rng.normal(0, 15, n) > 170).astype(int)
+    return X, y
+
+
+def _pipeline(estimator):
+    X, y = _data()
+    scaler = StandardScaler().fit(X)
+    return serving_pipeline(estimator.fit(scaler.transform(X), y), scaler), X
+
+
+def _on_splits(pipeline, X, seed=1):
+    """Rows with one feature set exactly on a split (in raw units) or one float64 step either side."""
+    scaler, forest = pipeline.named_steps["scale"], pipeline.named_steps["model"]
+    rng = np.random.default_rng(seed)
+    rows = []
+    for est in forest.estimators_:
+        t = est.tree_
+        for f, threshold in zip(t.feature, t.threshold):
+            if f < 0:
+                continue
+            raw = threshold * scaler.scale_[f] + scaler.mean_[f]
+            for value in (raw, np.nextafter(raw, -np.inf), np.nextafter(raw, np.inf)):
+                row = X[rng.integers(len(X))].copy()
+                row[f] = value
+                rows.append(row)
+    return np.array(rows)
+
+
+def test_linear_scorer_matches_pipeline():
+    pipeline, X = _pipeline(LogisticRegression(max_iter=1000))
+    scorer = compile_model(pipeline)
+    assert isinstance(scorer, LinearScorer)
+
+    model = pipeline.named_steps["model"]
+    scaler = pipeline.named_steps["scale"]
+    # rows on the decision boundary: shift feature 1 until the decision function is zero
+    boundary = X[:50].copy()
+    w = model.coef_.ravel() / scaler.scale_
+    boundary[:, 1] -= pipeline.decision_function(boundary) / w[1]
+    x = np.vstack([X, boundary])
+
+    assert np.allclose(scorer.predict_proba(x), pipeline.predict_proba(x), atol=1e-9)
+
+
+def test_forest_scorer_routes_split_values_like_sklearn():
+    pipeline, X = _pipeline(RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0))
+    scorer = compile_model(pipeline)
+    assert isinstance(scorer, ForestScorer)
+
+    x = np.vstack([X, _on_splits(pipeline, X)])
+    np.testing.assert_array_equal(scorer.predict_proba(x), pipeline.predict_proba(x))
+    np.testing.assert_array_equal(scorer.predict(x), pipeline.predict(x))
+
+
+def test_exported_scorer_round_trips(tmp_path):
+    pipeline, X = _pipeline(RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0))
+    path = str(tmp_path / "RandomForest.scorer.npz")
+
+    assert save_scorer(pipeline, path, "abc123")
+    scorer, version = load_scorer(path)
+
+    assert version == "abc123"
+    x = np.vstack([X, _on_splits(pipeline, X)])
+    np.testing.assert_array_equal(scorer.predict_proba(x), pipeline.predict_proba(x))
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from features import FEATURES
+from inference import encode_row, to_matrix
+from preprocessing import CategoricalEncoder
+
+GENDER = FEATURES.index("gender")
+
+
+def _row(gender):
+    row = [1.0] * len(FEATURES)
+    row[GENDER] = gender
+    return row
+
+
+def _encoder():
+    return CategoricalEncoder().fit(pd.DataFrame({"gender": ["Female", "Male"]}))
+
+
+def test_encode_row_maps_categories_with_the_encoder():
+    assert encode_row(_row("Male"), _encoder())[GENDER] == 1.0
+    assert encode_row(_row(1), _encoder()) == encode_row(_row("Male"), _encoder())
+    with pytest.raises(ValueError):
+        encode_row(_row("Other"), _encoder())
+
+
+def test_encode_row_without_encoder_returns_floats_or_raises():
+    # pipelines without an encoder step (and bare estimators) only take codes
+    assert encode_row(_row(1), None) == tuple([1.0] * len(FEATURES))
+    assert encode_row(_row("1"), None)[GENDER] == 1.0
+    with pytest.raises(ValueError, match="gender"):
+        encode_row(_row("Male"), None)
+
+
+def test_batch_rows_with_unencodable_categories_raise():
+    records = [dict(zip(FEATURES, _row("Male")))]
+    assert to_matrix(records, _encoder())[0, GENDER] == 1.0
+    with pytest.raises(ValueError):
+        to_matrix(records, None)
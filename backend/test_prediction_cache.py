@@ -0,0 +1,62 @@
+import prediction_cache
+from prediction_cache import PredictionCache
+
+ROW = [1.0, 2.5, 0.0]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hit_needs_the_same_version_and_quantized_row():
+    cache = PredictionCache(max_entries=10, quantum=1e-3)
+    cache.put("v1", ROW, 1)
+
+    assert cache.get("v1", ROW) == 1
+    assert cache.get("v1", [1.0, 2.5 + 1e-5, 0.0]) == 1  # within the quantum
+    assert cache.get("v1", [1.0, 2.6, 0.0]) is None
+    assert cache.get("v2", ROW) is None  # a hot-swapped model never sees old answers
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(prediction_cache.time, "monotonic", clock)
+    cache = PredictionCache(max_entries=10, ttl_s=60)
+    cache.put("v1", ROW, 0)
+
+    clock.now += 59
+    assert cache.get("v1", ROW) == 0
+    clock.now += 2
+    assert cache.get("v1", ROW) is None
+    assert cache.expirations == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put("v1", [1.0], 1)
+    cache.put("v1", [2.0], 2)
+    cache.get("v1", [1.0])  # [2.0] is now the oldest
+    cache.put("v1", [3.0], 3)
+
+    assert cache.get("v1", [2.0]) is None
+    assert cache.get("v1", [1.0]) == 1
+    assert cache.get("v1", [3.0]) == 3
+    assert cache.evictions == 1
+
+
+def test_clear_and_disabled_cache():
+    cache = PredictionCache(max_entries=10)
+    cache.put("v1", ROW, 1)
+    cache.clear()
+    assert cache.get("v1", ROW) is None
+
+    off = PredictionCache(max_entries=0)
+    off.put("v1", ROW, 1)
+    assert off.get("v1", ROW) is None
+    assert off.stats()["enabled"] is False
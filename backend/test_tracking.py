@@ -0,0 +1,40 @@
+import json
+import os
+
+from load_from_registry import LocalRegistry
+from tracking import FileBackend, Tracker
+
+
+def test_spooled_run_uploads_to_file_backend(tmp_path):
+    backend = FileBackend(root=str(tmp_path / "tracking"), registry_dir=str(tmp_path / "registry"))
+    tracker = Tracker(backend, spool_dir=str(tmp_path / "spool"), fallback=backend, interval=0.05)
+    model_path = tmp_path / "SVM.pkl"
+    model_path.write_bytes(b"fitted svm")
+
+    run = tracker.start_run("SVM", project="tests")
+    run.log_parameters({"C": 1.5, "kernel": "rbf"})
+    run.log_metrics({"f1": 0.8}, step=0)
+    run.log_metrics({"f1": 0.9}, step=1)
+    run.log_model("SVM", str(model_path))
+    run.end()
+    # the staged copy is what gets uploaded, not the file the script keeps writing to
+    model_path.write_bytes(b"overwritten")
+
+    assert tracker.close(timeout=10) == 0
+
+    (run_dir,) = (tmp_path / "tracking" / "tests").iterdir()
+    meta = json.loads((run_dir / "run.json").read_text())
+    assert meta["name"] == "SVM"
+    assert meta["params"] == {"C": 1.5, "kernel": "rbf"}
+    assert "ended" in meta
+    metrics = [json.loads(line) for line in (run_dir / "metrics.jsonl").read_text().splitlines()]
+    assert [(m["step"], m["f1"]) for m in metrics] == [(0, 0.8), (1, 0.9)]
+
+    # the logged model is served from the local registry layout
+    registry = LocalRegistry(str(tmp_path / "registry"))
+    version = registry.latest_version("SVM")
+    assert version == meta["models"]["SVM"]
+    fetched = registry.fetch("SVM", version, str(tmp_path))
+    with open(fetched, "rb") as f:
+        assert f.read() == b"fitted svm"
+    assert not os.listdir(tmp_path / "spool" / "files")
@@ -0,0 +1,437 @@
+"""Experiment tracking that neither blocks nor breaks training.
+
+Runs log into a local spool: an SQLite queue of events plus copies of the
+files they reference, so a call returns as soon as the event is on disk.
+A background thread uploads the spool one run at a time, coalescing that
+run's parameters and metrics into one call per kind (per step for
+metrics), and retries with exponential backoff. After MAX_ATTEMPTS
+failures a run is routed to the file backend instead, so nothing logged
+is lost. Whatever is still queued when the process exits is uploaded by
+the next tracker that opens the spool, or by `python tracking.py flush`.
+
+Backends:
+  comet  Comet ML (default when comet_ml is installed and COMET_API_KEY is set)
+  file   <TRACKING_DIR>/<project>/<run id>/ with run.json, metrics.jsonl and assets/;
+         logged models also land in LOCAL_REGISTRY_DIR in the layout
+         load_from_registry.LocalRegistry reads. Stands in for Comet in
+         tests and offline setups.
+
+Delivery is at least once: a batch that fails halfway is sent again.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from artifact_cache import sha256_file
+
+try:
+    import comet_ml
+except Exception:
+    comet_ml = None
+
+SPOOL_DIR = os.environ.get("TRACKING_SPOOL_DIR", ".tracking_spool")
+TRACKING_DIR = os.environ.get("TRACKING_DIR", "tracking")
+REGISTRY_DIR = os.environ.get("LOCAL_REGISTRY_DIR", "registry")
+UPLOAD_BATCH = int(os.environ.get("TRACKING_UPLOAD_BATCH", "200"))
+UPLOAD_INTERVAL_S = float(os.environ.get("TRACKING_UPLOAD_INTERVAL_S", "1.0"))
+MAX_ATTEMPTS = int(os.environ.get("TRACKING_MAX_ATTEMPTS", "5"))
+RETRY_BACKOFF_S = float(os.environ.get("TRACKING_RETRY_BACKOFF_S", "2.0"))
+RETRY_MAX_S = 60.0
+CLOSE_TIMEOUT_S = float(os.environ.get("TRACKING_CLOSE_TIMEOUT_S", "60"))
+LEASE_S = 300.0  # a run being uploaded is left alone by other processes for this long
+
+
+def _jsonable(value):
+    # numpy scalars and the like
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+class Spool:
+    """On-disk queue of tracking events, grouped by run.
+
+    Safe to share between threads and processes: a run is leased to one
+    uploader at a time, and its events are always sent in logging order.
+    """
+
+    def __init__(self, root=SPOOL_DIR):
+        self.root = root
+        os.makedirs(os.path.join(root, "files"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "spool.db"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs (id TEXT PRIMARY KEY, project TEXT, name TEXT, "
+            "created TEXT, remote_key TEXT, attempts INTEGER DEFAULT 0, next_try REAL DEFAULT 0, "
+            "lease_until REAL DEFAULT 0, fallback INTEGER DEFAULT 0)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "run_id TEXT, kind TEXT, payload TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_events_run ON events (run_id, id)")
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    def add_run(self, run_id, project, name):
+        self._execute("INSERT INTO runs (id, project, name, created) VALUES (?, ?, ?, ?)",
+                      (run_id, project, name, _now()))
+
+    def rename_run(self, run_id, name):
+        self._execute("UPDATE runs SET name = ? WHERE id = ?", (name, run_id))
+
+    def put(self, run_id, kind, payload):
+        payload = dict(payload, at=_now())
+        self._execute("INSERT INTO events (run_id, kind, payload) VALUES (?, ?, ?)",
+                      (run_id, kind, json.dumps(payload, default=_jsonable)))
+
+    def stage_file(self, run_id, path):
+        """Copy path into the spool; the run may overwrite or delete the original right away."""
+        run_dir = os.path.join(self.root, "files", run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        dest = os.path.join(run_dir, f"{uuid.uuid4().hex[:8]}-{os.path.basename(path)}")
+        shutil.copyfile(path, dest)
+        return dest
+
+    def claim(self, now=None, limit=UPLOAD_BATCH):
+        """Lease the oldest run that is due for upload. Returns (run, events) or None."""
+        now = now or time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT DISTINCT r.id FROM runs r JOIN events e ON e.run_id = r.id "
+                "WHERE r.next_try <= ? AND r.lease_until <= ? ORDER BY r.created LIMIT 8",
+                (now, now),
+            ).fetchall()
+            for (run_id,) in rows:
+                taken = self._conn.execute(
+                    "UPDATE runs SET lease_until = ? WHERE id = ? AND lease_until <= ?",
+                    (now + LEASE_S, run_id, now),
+                ).rowcount
+                if not taken:
+                    continue  # another uploader got there first
+                cols = ("id", "project", "name", "created", "remote_key", "attempts", "fallback")
+                run = dict(zip(cols, self._conn.execute(
+                    f"SELECT {', '.join(cols)} FROM runs WHERE id = ?", (run_id,)).fetchone()))
+                events = [
+                    {"id": i, "kind": kind, "payload": json.loads(payload)}
+                    for i, kind, payload in self._conn.execute(
+                        "SELECT id, kind, payload FROM events WHERE run_id = ? ORDER BY id LIMIT ?",
+                        (run_id, limit),
+                    )
+                ]
+                return run, events
+        return None
+
+    def done(self, run, events, remote_key=None):
+        ids = [e["id"] for e in events]
+        ended = any(e["kind"] == "end" for e in events)
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM events WHERE id = ?", [(i,) for i in ids])
+            if ended:
+                self._conn.execute("DELETE FROM runs WHERE id = ?", (run["id"],))
+            else:
+                self._conn.execute(
+                    "UPDATE runs SET remote_key = COALESCE(?, remote_key), attempts = 0, lease_until = 0 "
+                    "WHERE id = ?", (remote_key, run["id"]))
+        if ended:
+            # uploads read the staged copies until the run is ended
+            shutil.rmtree(os.path.join(self.root, "files", run["id"]), ignore_errors=True)
+
+    def retry(self, run, attempts, delay, fallback=False):
+        self._execute(
+            "UPDATE runs SET attempts = ?, next_try = ?, lease_until = 0, fallback = fallback OR ? WHERE id = ?",
+            (attempts, time.time() + delay, int(fallback), run["id"]))
+
+    def pending(self):
+        """(runs, events) still waiting to be uploaded."""
+        with self._lock:
+            runs = self._conn.execute("SELECT COUNT(DISTINCT run_id) FROM events").fetchone()[0]
+            events = self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        return runs, events
+
+    def close(self):
+        self._conn.close()
+
+
+class CometBackend:
+    """Uploads spooled runs to Comet ML, one Comet experiment per run."""
+
+    name = "comet"
+
+    def __init__(self, api_key=None, workspace=None):
+        self.api_key = api_key or os.environ.get("COMET_API_KEY")
+        self.workspace = workspace
+        self._experiments = {}  # run id -> live experiment
+
+    def _experiment(self, run):
+        experiment = self._experiments.get(run["id"])
+        if experiment is None:
+            if run["remote_key"]:
+                # started by an earlier process; keep logging to the same experiment
+                experiment = comet_ml.ExistingExperiment(api_key=self.api_key,
+                                                         previous_experiment=run["remote_key"])
+            else:
+                kwargs = {"workspace": self.workspace} if self.workspace else {}
+                experiment = comet_ml.Experiment(api_key=self.api_key, project_name=run["project"], **kwargs)
+                experiment.set_name(run["name"])
+            self._experiments[run["id"]] = experiment
+        return experiment
+
+    def upload(self, run, events):
+        experiment = self._experiment(run)
+        params, metrics = {}, {}
+        for event in events:
+            kind, p = event["kind"], event["payload"]
+            if kind == "params":
+                params.update(p["params"])
+            elif kind == "metrics":
+                metrics.setdefault(p.get("step"), {}).update(p["metrics"])
+        if params:
+            experiment.log_parameters(params)
+        for step, values in metrics.items():
+            experiment.log_metrics(values, step=step)
+
+        for event in events:
+            kind, p = event["kind"], event["payload"]
+            if kind == "name":
+                experiment.set_name(p["name"])
+            elif kind == "asset":
+                experiment.log_asset(p["path"], file_name=p["file_name"])
+            elif kind == "image":
+                experiment.log_image(p["path"], name=p["file_name"])
+            elif kind == "model":
+                experiment.log_model(p["name"], p["path"], file_name=p["file_name"])
+            elif kind == "register":
+                experiment.register_model(p["model_name"], version=p.get("version"),
+                                          description=p.get("description"))
+            elif kind == "end":
+                experiment.end()  # waits for Comet's own uploads of the staged files
+                self._experiments.pop(run["id"], None)
+        return experiment.get_key()
+
+
+class FileBackend:
+    """Writes runs to a local directory tree; see the module docstring for the layout."""
+
+    name = "file"
+
+    def __init__(self, root=TRACKING_DIR, registry_dir=REGISTRY_DIR):
+        self.root = root
+        self.registry_dir = registry_dir
+
+    def upload(self, run, events):
+        run_dir = os.path.join(self.root, run["project"], run["id"])
+        assets = os.path.join(run_dir, "assets")
+        os.makedirs(assets, exist_ok=True)
+        meta_path = os.path.join(run_dir, "run.json")
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {"id": run["id"], "project": run["project"], "created": run["created"],
+                    "params": {}, "models": {}, "registered": []}
+        meta["name"] = run["name"]
+
+        lines = []
+        for event in events:
+            kind, p = event["kind"], event["payload"]
+            if kind == "params":
+                meta["params"].update(p["params"])
+            elif kind == "metrics":
+                lines.append(json.dumps({"step": p.get("step"), "at": p["at"], **p["metrics"]}))
+            elif kind in ("asset", "image"):
+                shutil.copyfile(p["path"], os.path.join(assets, p["file_name"]))
+            elif kind == "model":
+                shutil.copyfile(p["path"], os.path.join(assets, p["file_name"]))
+                meta["models"][p["name"]] = self._register(p["name"], p["path"], p["at"])
+            elif kind == "register":
+                meta["registered"].append({k: v for k, v in p.items() if k != "at"})
+            elif kind == "end":
+                meta["ended"] = p["at"]
+        if lines:
+            with open(os.path.join(run_dir, "metrics.jsonl"), "a") as f:
+                f.write("\n".join(lines) + "\n")
+        tmp = meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=2, default=_jsonable)
+        os.replace(tmp, meta_path)
+        return run_dir
+
+    def _register(self, name, path, logged_at):
+        # version = log time + content hash: sorts chronologically, and a retried upload lands in the same place
+        version = f"{re.sub(r'[^0-9T]', '', logged_at)[:15]}-{sha256_file(path)[:12]}"
+        dest_dir = os.path.join(self.registry_dir, name, version)
+        os.makedirs(dest_dir, exist_ok=True)
+        tmp = os.path.join(dest_dir, f"{name}.pkl.tmp")
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, os.path.join(dest_dir, f"{name}.pkl"))
+        return version
+
+
+def get_backend(api_key=None, workspace=None):
+    """Backend from TRACKING_BACKEND: "comet" (default when installed and configured) or "file"."""
+    api_key = api_key or os.environ.get("COMET_API_KEY")
+    default = "comet" if comet_ml is not None and api_key else "file"
+    kind = os.environ.get("TRACKING_BACKEND", default)
+    if kind == "comet" and comet_ml is not None:
+        return CometBackend(api_key, workspace)
+    return FileBackend()
+
+
+class Run:
+    """Handle returned by Tracker.start_run; mirrors the comet_ml.Experiment calls the scripts use.
+
+    Every call only appends to the spool.
+    """
+
+    def __init__(self, tracker, run_id, project, name):
+        self.tracker = tracker
+        self.id = run_id
+        self.project = project
+        self.name = name
+
+    def _put(self, kind, **payload):
+        self.tracker.spool.put(self.id, kind, payload)
+        self.tracker.wake()
+
+    def _stage(self, path):
+        return self.tracker.spool.stage_file(self.id, path)
+
+    def set_name(self, name):
+        self.name = name
+        self.tracker.spool.rename_run(self.id, name)
+        self._put("name", name=name)
+
+    def log_parameters(self, params):
+        self._put("params", params=dict(params))
+
+    def log_metrics(self, metrics, step=None):
+        self._put("metrics", metrics=dict(metrics), step=step)
+
+    def log_asset(self, path, file_name=None):
+        self._put("asset", path=self._stage(path), file_name=file_name or os.path.basename(path))
+
+    def log_image(self, path, name=None):
+        self._put("image", path=self._stage(path), file_name=name or os.path.basename(path))
+
+    def log_model(self, name, path, file_name=None):
+        self._put("model", name=name, path=self._stage(path), file_name=file_name or os.path.basename(path))
+
+    def register_model(self, model_name, version=None, description=None):
+        self._put("register", model_name=model_name, version=version, description=description)
+
+    def end(self):
+        self._put("end")
+
+
+class Tracker:
+    """Creates runs and uploads the spool in the background.
+
+    Call close() before exiting to give the uploader up to timeout seconds
+    to drain; anything left stays in the spool for the next tracker.
+    """
+
+    def __init__(self, backend=None, spool_dir=SPOOL_DIR, fallback=None, interval=UPLOAD_INTERVAL_S):
+        self.backend = backend if backend is not None else get_backend()
+        self.fallback = fallback if fallback is not None else FileBackend()
+        self.spool = Spool(spool_dir)
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tracking-upload", daemon=True)
+        self._thread.start()
+        self.uploaded = 0
+        self.failures = 0
+
+    def start_run(self, name, project="diabetes-prediction"):
+        run_id = f"{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.spool.add_run(run_id, project, name)
+        self.wake()
+        return Run(self, run_id, project, name)
+
+    def wake(self):
+        self._wake.set()
+
+    def upload_once(self):
+        """Upload one batch of one run. Returns the number of events delivered."""
+        claimed = self.spool.claim()
+        if claimed is None:
+            return 0
+        run, events = claimed
+        if not events:
+            self.spool.done(run, events)
+            return 0
+        backend = self.fallback if run["fallback"] else self.backend
+        try:
+            remote_key = backend.upload(run, events)
+        except Exception as exc:
+            self.failures += 1
+            attempts = run["attempts"] + 1
+            if attempts >= MAX_ATTEMPTS and backend is not self.fallback:
+                print(f"tracking: {backend.name} failed {attempts} times for run {run['name']} ({exc}); "
+                      f"writing it to {self.fallback.name} instead")
+                self.spool.retry(run, 0, 0.0, fallback=True)
+            else:
+                delay = min(RETRY_MAX_S, RETRY_BACKOFF_S * 2 ** (attempts - 1))
+                print(f"tracking: upload of run {run['name']} failed ({exc}); retrying in {delay:.0f}s")
+                self.spool.retry(run, attempts, delay)
+            return 0
+        self.spool.done(run, events, remote_key if backend is self.backend else None)
+        self.uploaded += len(events)
+        return len(events)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                while self.upload_once():
+                    pass
+            except Exception as exc:
+                print(f"tracking upload failed: {exc}")
+            if self._stopping.is_set() and not self.spool.pending()[1]:
+                return
+
+    def close(self, timeout=CLOSE_TIMEOUT_S):
+        """Wait up to timeout seconds for the spool to drain. Returns the number of events left."""
+        self._stopping.set()
+        self.wake()
+        self._thread.join(timeout)
+        runs, events = self.spool.pending()
+        if events:
+            print(f"tracking: {events} events of {runs} runs left in {self.spool.root}; "
+                  f"they upload on the next run or with `python tracking.py flush`")
+        return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or drain the experiment-tracking spool.")
+    parser.add_argument("command", choices=["status", "flush"])
+    parser.add_argument("--timeout", type=float, default=CLOSE_TIMEOUT_S,
+                        help="seconds to keep retrying before leaving the rest in the spool")
+    args = parser.parse_args()
+    if args.command == "status":
+        runs, events = Spool().pending()
+        print(f"{events} events of {runs} runs waiting in {SPOOL_DIR}")
+        return 0
+    tracker = Tracker()
+    left = tracker.close(args.timeout)
+    print(f"Uploaded {tracker.uploaded} events to {tracker.backend.name}")
+    return 1 if left else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,97 +1,55 @@
 #diabeticsclassifier
-try:
-    from comet_ml import Experiment
-except Exception:
-    class Experiment:
-        def __init__(self, *args, **kwargs):
-            pass
-        def set_name(self, *args, **kwargs):
-            pass
-        def log_parameters(self, *args, **kwargs):
-            pass
-        def log_metrics(self, *args, **kwargs):
-            pass
-        def log_asset(self, *args, **kwargs):
-            pass
-        def log_model(self, *args, **kwargs):
-            pass
-        def log_image(self, *args, **kwargs):
-            pass
-        def end(self, *args, **kwargs):
-            pass
-
+import argparse
 import joblib
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
 from sklearn.metrics import ConfusionMatrixDisplay, RocCurveDisplay
 from sklearn.linear_model import LogisticRegression
 from sklearn.svm import SVC
 from sklearn.ensemble import RandomForestClassifier
-from imblearn.over_sampling import SMOTE
 import matplotlib.pyplot as plt
-
-# ============== Load and Preprocess Data ==============
-# Ensure this CSV exists in the same folder or provide full path
-df = pd.read_csv("Diabetes_Final_Data_V2.csv") 
+from reference_profile import build_profile, save_profile
+from load_from_registry import artifact_version
+from fast_scorer import save_scorer, SCORER_SUFFIX
+from features import FEATURES
+from preprocessing import serving_pipeline
+from train_engine import StageTimer, fit_candidates, prepare
+import incremental
+import search
+from tracking import Tracker
+from evaluation import CALIBRATION_METHODS, CALIBRATION_SIZE, calibrate, evaluate, needs_calibration
 
 label_cols = [
     "gender", "family_diabetes", "hypertensive",
     "family_hypertension", "cardiovascular_disease", "stroke"
 ]
-
-le = LabelEncoder()
-for col in label_cols:
-    df[col] = le.fit_transform(df[col])
-
-df["diabetic"] = df["diabetic"].map({"No": 0, "Yes": 1})
-
-X = df.drop("diabetic", axis=1)
-y = df["diabetic"]
-
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
-
-scaler = StandardScaler()
-X_train = scaler.fit_transform(X_train)
-X_test = scaler.transform(X_test)
-
-sm = SMOTE(random_state=42)
-X_train, y_train = sm.fit_resample(X_train, y_train)
+target_map = {"No": 0, "Yes": 1}
 
 # ============== Helper Function (Comet ML) ==============
-def log_results_to_comet(model_name, model, X_test, y_test, **params):
-    
-    experiment = Experiment(
-        api_key="",  
-        project_name="diabetes-prediction",
-        workspace="",
-        auto_output_logging="simple"
-    )
-
-    experiment.set_name(model_name)
+def log_results_to_comet(tracker, model_name, model, X_test, y_test, scaler, encoder, promote=False, **params):
+    # every call on the run only spools to disk; the tracker uploads in the background
+    experiment = tracker.start_run(model_name, project="diabetes-prediction")
     experiment.log_parameters(params)
 
-    y_pred = model.predict(X_test)
-
-    acc = accuracy_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred)
-    recall = recall_score(y_test, y_pred)
+    # one scoring pass; the metrics and both plots below reuse its output
+    result = evaluate(model, X_test, y_test)
+    metrics = result["metrics"]
+    acc, f1 = metrics["accuracy"], metrics["f1"]
+    precision, recall = metrics["precision"], metrics["recall"]
 
     experiment.log_metrics({
         "accuracy": acc,
         "f1_score": f1,
         "precision": precision,
-        "recall": recall
+        "recall": recall,
+        "roc_auc": metrics["roc_auc"]
     })
 
     # --- FIX START: Save the model FIRST before trying to upload it ---
+    # The artifact is encoder + scaler + model, so serving can score raw rows
     model_path = f"{model_name}.pkl"
-    joblib.dump(model, model_path)
+    pipeline = serving_pipeline(model, scaler, encoder)
+    joblib.dump(pipeline, model_path)
     
     # Now you can log it as an asset (optional specific name)
     experiment.log_asset(
@@ -101,17 +59,25 @@ def log_results_to_comet(model_name, model, X_test, y_test, **params):
     
     # And log it as a registered model
     experiment.log_model(model_name, model_path)
+    if promote:
+        # the search winner is the one model version registered from this training run
+        experiment.register_model(model_name, description="best model of the hyperparameter search")
+
+    # Compact NumPy scoring artifact for the serving fast path (LR / RF only)
+    scorer_path = f"{model_name}{SCORER_SUFFIX}"
+    if save_scorer(pipeline, scorer_path, artifact_version(model_path)):
+        experiment.log_asset(scorer_path, file_name=scorer_path)
     # --- FIX END ---
 
     # Confusion Matrix
-    ConfusionMatrixDisplay.from_estimator(model, X_test, y_test)
+    ConfusionMatrixDisplay.from_predictions(y_test, result["y_pred"])
     plt.title(f"{model_name} - Confusion Matrix")
     plt.savefig("confusion_matrix.png")
     experiment.log_image("confusion_matrix.png")
     plt.close()
 
     # ROC Curve
-    RocCurveDisplay.from_estimator(model, X_test, y_test)
+    RocCurveDisplay.from_predictions(y_test, result["y_score"])
     plt.title(f"{model_name} - ROC Curve")
     plt.savefig("roc_curve.png")
     experiment.log_image("roc_curve.png")
@@ -119,7 +85,7 @@ def log_results_to_comet(model_name, model, X_test, y_test, **params):
 
     experiment.end()
 
-    print(f"{model_name} logged to Comet ML ✅")
+    print(f"{model_name} queued for Comet ML ✅")
     print(
         f"Accuracy: {acc:.3f}, "
         f"F1: {f1:.3f}, "
@@ -127,53 +93,155 @@ def log_results_to_comet(model_name, model, X_test, y_test, **params):
         f"Recall: {recall:.3f}\n"
     )
 
+def log_trial_to_comet(tracker, trial, metric):
+    """One experiment per search trial, with its cross-validated score at each rung."""
+    experiment = tracker.start_run(f"{trial['model']}-trial-{trial['trial']}", project="diabetes-prediction")
+    experiment.log_parameters(trial["params"])
+    for rung, (score, fraction) in enumerate(zip(trial["scores"], trial["fractions"])):
+        experiment.log_metrics({f"cv_{metric}": score, "train_fraction": fraction}, step=rung)
+    experiment.end()
+
 # ============== Train & Log Models ==============
 
-lr = LogisticRegression(
-    class_weight="balanced",
-    solver="liblinear",
-    random_state=42
-)
-lr.fit(X_train, y_train)
-log_results_to_comet(
-    "LogisticRegression",
-    lr,
-    X_test,
-    y_test,
-    solver="liblinear",
-    class_weight="balanced"
-)
-
-svm = SVC(
-    kernel="rbf",
-    C=1.5,
-    probability=True,
-    class_weight="balanced",
-    random_state=42
-)
-svm.fit(X_train, y_train)
-log_results_to_comet(
-    "SVM",
-    svm,
-    X_test,
-    y_test,
-    kernel="rbf",
-    C=1.5,
-    class_weight="balanced"
-)
-
-rf = RandomForestClassifier(
-    n_estimators=200,
-    max_depth=10,
-    random_state=42
-)
-rf.fit(X_train, y_train)
-log_results_to_comet(
-    "RandomForest",
-    rf,
-    X_test,
-    y_test,
-    n_estimators=200,
-    max_depth=10
-
-)
+def make_models(params):
+    return {
+        "LogisticRegression": LogisticRegression(random_state=42, **params["LogisticRegression"]),
+        # no probability=True: its internal 5-fold Platt scaling is replaced by calibrate()
+        "SVM": SVC(random_state=42, **params["SVM"]),
+        "RandomForest": RandomForestClassifier(random_state=42, **params["RandomForest"]),
+    }
+
+
+def tune(tracker, df, params, timer):
+    """Search hyperparameters for every model.
+
+    Returns params with each family's best configuration merged in, and
+    the name of the family with the best cross-validated score at the
+    search's highest complete rung (None when no trial finished).
+    """
+    # folds are cut from the split before SMOTE, so synthetic rows never reach a validation fold
+    _, data_path = prepare(
+        df, "diabetic", features=FEATURES, categorical=label_cols, target_map=target_map,
+        test_size=0.2, seed=42, timer=timer,
+    )
+    result = search.search(make_models(params), data_path, timer=timer)
+    with timer.stage("log trials"):
+        for trial in result["trials"]:
+            if trial["scores"]:
+                log_trial_to_comet(tracker, trial, result["metric"])
+    return {name: {**p, **result["best"].get(name, {})} for name, p in params.items()}, result["winner"]
+
+
+def train_full(tracker, timer, tune_params=False, calibration="sigmoid"):
+    """Retrain every model from scratch on the base dataset and start a new checkpoint.
+
+    The checkpoint's observation cursor starts at the beginning of the
+    log, so the next incremental update folds in every labeled observation.
+    Returns (models, data, params, winner); winner is the search's best
+    model, or None without tune_params.
+    """
+    # Ensure this CSV exists in the same folder or provide full path
+    with timer.stage("load"):
+        df = pd.read_csv("Diabetes_Final_Data_V2.csv")
+
+    # encode, split, scale and SMOTE; reused from disk when the data has not changed.
+    # FEATURES order is the serving order; the fused pipeline relies on it
+    data, data_path = prepare(
+        df, "diabetic", features=FEATURES, categorical=label_cols, target_map=target_map,
+        test_size=0.2, seed=42, smote=True,
+        calibration_size=CALIBRATION_SIZE if calibration != "none" else 0.0, timer=timer,
+    )
+
+    params = {
+        "LogisticRegression": {"solver": "liblinear", "class_weight": "balanced"},
+        "SVM": {"kernel": "rbf", "C": 1.5, "class_weight": "balanced"},
+        "RandomForest": {"n_estimators": 200, "max_depth": 10},
+    }
+    winner = None
+    if tune_params:
+        params, winner = tune(tracker, df, params, timer)
+    candidates = make_models(params)
+    # only the models calibrated afterwards give up the calibration rows
+    holdout = [n for n, est in candidates.items() if needs_calibration(est)] if calibration != "none" else []
+    models = fit_candidates(candidates, data_path, timer=timer, holdout=holdout)
+
+    with timer.stage("checkpoint"):
+        incremental.save_checkpoint(incremental.new_checkpoint(models, data, None, params))
+    return models, data, params, winner
+
+
+def train_incremental(checkpoint, timer):
+    """Fold only the observations logged since the checkpoint into its models.
+
+    Returns None when there is nothing new to learn from.
+    """
+    with timer.stage("load (new rows)"):
+        new_rows, cursor = incremental.labeled_observations(checkpoint["cursor"], target_map)
+    if new_rows.empty:
+        print("No new labeled observations since the last retrain")
+        return None
+    models = incremental.update(checkpoint, new_rows, timer)
+    checkpoint["cursor"] = cursor
+    with timer.stage("checkpoint"):
+        incremental.save_checkpoint(checkpoint)
+    data = {k: checkpoint.get(k) for k in ("X_test", "y_test", "X_calib", "y_calib", "scaler", "encoder")}
+    return models, data, checkpoint["params"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train, log and export the diabetes models.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="update the checkpointed models with new labeled observations only; "
+                             "falls back to a full rebuild when there is no usable checkpoint")
+    parser.add_argument("--search", action="store_true",
+                        help="tune hyperparameters by successive halving before a full rebuild "
+                             "and register only the best model (budget: TRAIN_SEARCH_BUDGET_S)")
+    parser.add_argument("--calibration", choices=CALIBRATION_METHODS, default="sigmoid",
+                        help="post-hoc probability calibration for models without predict_proba (the SVM), "
+                             "fitted on TRAIN_CALIBRATION_SIZE of the training split that only the SVM gives up")
+    args = parser.parse_args(argv)
+    timer = StageTimer()
+    tracker = Tracker()
+
+    full = True
+    if args.incremental:
+        reason = incremental.needs_full_rebuild(incremental.load_checkpoint())
+        full = reason is not None
+        if full:
+            print(f"Full rebuild: {reason}")
+    reference = winner = None
+    if full:
+        models, data, params, winner = train_full(tracker, timer, tune_params=args.search,
+                                          calibration=args.calibration)
+        reference = data["X_reference"]
+    if args.incremental:
+        # right after a rebuild this folds in every labeled observation, otherwise only the new ones
+        updated = train_incremental(incremental.load_checkpoint(), timer)
+        if updated is not None:
+            models, data, params = updated
+        elif not full:
+            tracker.close()
+            timer.report()
+            return
+
+    for name, model in models.items():
+        if args.calibration != "none" and needs_calibration(model) and data.get("X_calib") is not None:
+            with timer.stage(f"calibrate {name}"):
+                model = calibrate(model, data["X_calib"], data["y_calib"], args.calibration)
+        with timer.stage(f"log {name}"):
+            log_results_to_comet(tracker, name, model, data["X_test"], data["y_test"],
+                                 data["scaler"], data["encoder"], promote=name == winner, **params[name])
+
+    # ============== Reference Profile for Drift Checks ==============
+    if reference is not None:
+        # incremental updates keep the scaler and reference distribution of the last rebuild
+        with timer.stage("reference profile"):
+            save_profile(build_profile(reference, artifact_version("LogisticRegression.pkl")))
+        print("reference_profile.npz saved")
+    with timer.stage("tracking upload"):
+        tracker.close()
+    timer.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from preprocessing import CategoricalEncoder
+
+CACHE_DIR = os.environ.get("TRAIN_CACHE_DIR", ".train_cache")
+TRAIN_WORKERS = int(os.environ.get("TRAIN_WORKERS", str(os.cpu_count() or 1)))
+CACHE_KEEP = int(os.environ.get("TRAIN_CACHE_KEEP", "3"))
+
+
+class StageTimer:
+    """Wall time per named stage, printed as a table at the end of a run."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def report(self):
+        width = max((len(n) for n in self.stages), default=0)
+        print("\nStage timings:")
+        for name, seconds in self.stages.items():
+            print(f"  {name:<{width}}  {seconds:8.2f}s")
+        return dict(self.stages)
+
+
+def data_hash(df, **params):
+    """Hash of a frame's contents plus the preprocessing parameters applied to it."""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    h.update(json.dumps([list(map(str, df.columns)), params], sort_keys=True, default=str).encode())
+    return h.hexdigest()[:16]
+
+
+def _preprocess(df, target, features, categorical, target_map, test_size, seed, stratify, smote,
+                calibration_size):
+    encoder = None
+    if categorical:
+        encoder = CategoricalEncoder(categorical).fit(df)
+        df = encoder.encode_frame(df)
+    y = df[target].map(target_map) if target_map else df[target]
+    X = df[features] if features else df.drop(columns=[target])
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=seed, stratify=y if stratify else None
+    )
+    # unscaled copy: serving sees raw feature values, so drift is profiled on those
+    X_reference = X_train.copy()
+
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X_train.to_numpy(dtype=float))
+    X_test = scaler.transform(X_test.to_numpy(dtype=float))
+    y_train = y_train.to_numpy()
+    y_test = y_test.to_numpy()
+
+    # rows before resampling and without the calibration slice: incremental replay starts from these
+    X_base, y_base, X_calib, y_calib = X_train, y_train, None, None
+    if calibration_size:
+        X_base, X_calib, y_base, y_calib = train_test_split(
+            X_train, y_train, test_size=calibration_size, random_state=seed,
+            stratify=y_train if stratify else None,
+        )
+
+    def resample(X_fit, y_fit):
+        if not smote:
+            return np.ascontiguousarray(X_fit), np.asarray(y_fit)
+        from imblearn.over_sampling import SMOTE
+        X_fit, y_fit = SMOTE(random_state=seed).fit_resample(X_fit, y_fit)
+        return np.ascontiguousarray(X_fit), np.asarray(y_fit)
+
+    X_fit, y_fit = resample(X_train, y_train)
+    data = {
+        "X_train": X_fit, "y_train": y_fit,
+        "X_base": X_base, "y_base": y_base,
+        "X_test": X_test, "y_test": y_test, "X_calib": X_calib, "y_calib": y_calib,
+        "X_reference": X_reference,
+        "columns": list(X.columns), "scaler": scaler, "encoder": encoder,
+    }
+    if calibration_size:
+        # only models calibrated afterwards fit on this; the rest keep every training row
+        data["X_holdout"], data["y_holdout"] = resample(X_base, y_base)
+    return data
+
+
+def prepare(df, target, features=None, categorical=None, target_map=None, test_size=0.2,
+            seed=42, stratify=False, smote=False, calibration_size=0.0, cache_dir=CACHE_DIR, timer=None):
+    """Encode, split, scale and optionally SMOTE-resample df, reusing a cached result.
+
+    Results are stored under cache_dir keyed by a hash of the data and
+    every parameter above, so retraining on unchanged data skips this
+    step. Returns (data, path): the dict of arrays and fitted
+    preprocessors, and the cache file that fit_candidates reads.
+
+    calibration_size > 0 also holds that share of the training split out
+    as X_calib / y_calib (scaled, never resampled) for post-hoc calibration,
+    and stores X_holdout / y_holdout: the training rows without it, for
+    the models that get calibrated (see fit_candidates' `holdout`).
+    X_train keeps every training row for everything else.
+    """
+    timer = timer or StageTimer()
+    os.makedirs(cache_dir, exist_ok=True)
+    key = data_hash(df, target=target, features=features, categorical=categorical, target_map=target_map,
+                    test_size=test_size, seed=seed, stratify=stratify, smote=smote,
+                    calibration_size=calibration_size)
+    path = os.path.join(cache_dir, f"prepared-{key}.joblib")
+    if os.path.exists(path):
+        with timer.stage("preprocess (cached)"):
+            data = joblib.load(path, mmap_mode="r")
+        print(f"Reusing preprocessed data {path}")
+        return data, path
+    with timer.stage("preprocess"):
+        data = _preprocess(df, target, features, categorical, target_map, test_size, seed, stratify, smote,
+                           calibration_size)
+    with timer.stage("cache write"):
+        tmp = path + ".tmp"
+        joblib.dump(data, tmp)
+        os.replace(tmp, path)
+        _prune(cache_dir)
+    return data, path
+
+
+def _prune(cache_dir, keep=CACHE_KEEP):
+    """Drop all but the `keep` most recently written prepared datasets and fold sets."""
+    for prefix in ("prepared-", "folds-"):
+        files = [os.path.join(cache_dir, f) for f in os.listdir(cache_dir)
+                 if f.startswith(prefix) and f.endswith(".joblib")]
+        for old in sorted(files, key=os.path.getmtime, reverse=True)[keep:]:
+            os.remove(old)
+
+
+def _fit(name, estimator, data_path, holdout=False):
+    # memory-mapped: concurrent fits share one copy of the training matrix
+    data = joblib.load(data_path, mmap_mode="r")
+    X, y = (data["X_holdout"], data["y_holdout"]) if holdout else (data["X_train"], data["y_train"])
+    started = time.perf_counter()
+    estimator.fit(X, y)
+    return name, estimator, time.perf_counter() - started
+
+
+def fit_candidates(candidates, data_path, workers=TRAIN_WORKERS, timer=None, holdout=()):
+    """Fit every estimator in `candidates` (name -> unfitted estimator) concurrently.
+
+    Each candidate gets its own process. Ensembles that take n_jobs
+    (e.g. RandomForest) share whatever cores the single-threaded ones
+    leave free. Names in `holdout` fit on X_holdout, leaving the
+    calibration rows unseen. Returns name -> fitted estimator, in the
+    input order.
+    """
+    timer = timer or StageTimer()
+    # ensembles parallelize over their members; n_jobs on anything else is a no-op here
+    parallel = [n for n, est in candidates.items() if {"n_jobs", "n_estimators"} <= set(est.get_params())]
+    serial = len(candidates) - len(parallel)
+    spare = max(1, (workers - serial) // max(1, len(parallel)))
+    for name in parallel:
+        candidates[name].set_params(n_jobs=spare)
+
+    fitted = {}
+    with timer.stage("fit (wall)"):
+        # spawn: callers may have threads running (e.g. the tracking uploader), which fork does not copy safely
+        with ProcessPoolExecutor(max(1, min(workers, len(candidates))),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(_fit, name, est, data_path, name in holdout) for name, est in candidates.items()]
+            for future in as_completed(futures):
+                name, estimator, seconds = future.result()
+                timer.record(f"fit {name}", seconds)
+                print(f"{name} trained in {seconds:.2f}s")
+                fitted[name] = estimator
+    return {name: fitted[name] for name in candidates}
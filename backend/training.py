@@ -1,16 +1,20 @@
-import requests
+import asyncio
 import os
-import time
-from requests.exceptions import ConnectionError, Timeout, HTTPError
+from datetime import datetime
 
+import httpx
 
-def trigger_training(retries: int = 8, backoff: float = 1.5):
+TRIGGER_CONCURRENCY = int(os.environ.get("TRAIN_TRIGGER_CONCURRENCY", "1"))
+
+
+async def trigger_training(retries: int = 8, backoff: float = 1.5):
     """Trigger the Airflow DAG via the Airflow REST API with retries.
 
     Retries are useful because Airflow can take some time to become
     available after startup. The backend and airflow services share a
     Docker network so `airflow:8080` should resolve from the backend
-    container when using compose.
+    container when using compose. Waiting between attempts uses
+    asyncio.sleep, so a slow Airflow never holds a worker thread.
     """
     host = os.environ.get("AIRFLOW_HOST", "http://airflow:8080")
     dag_id = os.environ.get("AIRFLOW_DAG_ID", "diabetes_training_pipeline")
@@ -24,17 +28,82 @@ def trigger_training(retries: int = 8, backoff: float = 1.5):
     if api_user and api_pass:
         auth = (api_user, api_pass)
 
-    for attempt in range(1, retries + 1):
-        try:
-            resp = requests.post(url, json={"conf": {}}, timeout=10, auth=auth)
-            resp.raise_for_status()
-            return resp.json()
-        except (ConnectionError, Timeout) as exc:
-            last_exc = exc
-            wait = backoff * attempt
-            time.sleep(wait)
-        except HTTPError as exc:
-            # Non-retryable HTTP error (4xx/5xx)
-            raise RuntimeError(f"Airflow API error ({exc.response.status_code}): {exc.response.text}") from exc
+    async with httpx.AsyncClient(timeout=10, auth=auth) as client:
+        for attempt in range(1, retries + 1):
+            try:
+                resp = await client.post(url, json={"conf": {}})
+                resp.raise_for_status()
+                return resp.json()
+            except (httpx.ConnectError, httpx.TimeoutException) as exc:
+                last_exc = exc
+                wait = backoff * attempt
+                await asyncio.sleep(wait)
+            except httpx.HTTPStatusError as exc:
+                # Non-retryable HTTP error (4xx/5xx)
+                raise RuntimeError(f"Airflow API error ({exc.response.status_code}): {exc.response.text}") from exc
 
     raise RuntimeError(f"Could not connect to Airflow at {host} after {retries} attempts") from last_exc
+
+
+class TrainingScheduler:
+    """Runs trigger_training as background tasks, at most TRIGGER_CONCURRENCY at once.
+
+    /train returns as soon as a trigger is scheduled; the outcome is passed
+    to `on_result(action, detail)` for logging.
+    """
+
+    def __init__(self, concurrency=TRIGGER_CONCURRENCY, on_result=None):
+        self.concurrency = concurrency
+        self.on_result = on_result
+        self._sem = None
+        self._tasks = set()
+        self.queued = 0
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.last_error = None
+        self.last_completed = None
+
+    def schedule(self):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        task = asyncio.get_running_loop().create_task(self._run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self):
+        self.queued += 1
+        async with self._sem:
+            self.queued -= 1
+            self.running += 1
+            try:
+                result = await trigger_training()
+                self.succeeded += 1
+                await self._report("dag_run_created", result.get("dag_run_id", ""))
+            except Exception as exc:
+                self.failed += 1
+                self.last_error = str(exc)
+                await self._report("failed", str(exc))
+            finally:
+                self.running -= 1
+                self.last_completed = datetime.utcnow().isoformat()
+
+    async def _report(self, action, detail):
+        if self.on_result is not None:
+            try:
+                # on_result writes to disk; keep it off the event loop
+                await asyncio.to_thread(self.on_result, action, detail)
+            except Exception as exc:
+                print(f"training result callback failed: {exc}")
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "queue_depth": self.queued,
+            "running": self.running,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "last_error": self.last_error,
+            "last_completed": self.last_completed,
+        }
@@ -3,11 +3,16 @@ from airflow.operators.python import PythonOperator
 from datetime import datetime
 import subprocess
 
-def train_model():
-    subprocess.run(
-        ["python", "backend/train_and_log.py"],
-        cwd="/opt/airflow"
-    )
+def train_model(**context):
+    # incremental by default; trigger with {"full": true} to rebuild from scratch,
+    # and add "search": true to tune hyperparameters during that rebuild
+    conf = context["dag_run"].conf or {}
+    cmd = ["python", "backend/train_and_log.py"]
+    if not conf.get("full"):
+        cmd.append("--incremental")
+    if conf.get("search"):
+        cmd.append("--search")
+    subprocess.run(cmd, cwd="/opt/airflow", check=True)
 
 with DAG(
     dag_id="diabetes_training_pipeline",
@@ -1,7 +1,13 @@
-import time
+import argparse
+import asyncio
+import json
+import sys
 import time
 import os
-import random
+from datetime import datetime
+
+import httpx
+import numpy as np
 import requests
 import pandas as pd
 
@@ -20,55 +26,445 @@ def load_source():
     return None
 
 
-def sample_record(df):
-    # sample a real row and perturb numeric columns slightly
-    row = df.sample(1).iloc[0].to_dict()
-    # perturb numeric columns
-    for k, v in row.items():
-        if isinstance(v, (int, float)):
-            noise = (random.random() - 0.5) * 0.1 * (abs(v) + 1)
-            row[k] = float(v + noise)
-    # coerce expected types for categorical flags to 0/1
-    for cat in ['gender','family_diabetes','hypertensive','family_hypertension','cardiovascular_disease','stroke']:
-        if cat in row:
+FEATURES = ['age', 'gender', 'pulse_rate', 'systolic_bp', 'diastolic_bp', 'glucose', 'height', 'weight',
+            'bmi', 'family_diabetes', 'hypertensive', 'family_hypertension', 'cardiovascular_disease', 'stroke']
+CATEGORICAL = ['gender','family_diabetes','hypertensive','family_hypertension','cardiovascular_disease','stroke']
+# (low, high) of the fallback generator when no source CSV is available; categoricals are 0/1
+RANDOM_RANGES = {
+    'age': (18, 80), 'pulse_rate': (50, 110), 'systolic_bp': (90, 160), 'diastolic_bp': (60, 100),
+    'glucose': (70, 200), 'height': (150, 190), 'weight': (50, 120), 'bmi': (18, 40),
+}
+# numeric values move by up to ±NOISE/2 * (|v| + 1)
+NOISE = 0.1
+BLOCK_SIZE = int(os.environ.get('GEN_BLOCK_SIZE', '1024'))
+
+
+class DriftProfile:
+    """Relative shift of chosen features as a function of the record index.
+
+    gradual ramps linearly from 0 to `magnitude` over `duration` records
+    starting at `start`; sudden jumps to `magnitude` at `start`; seasonal
+    oscillates with amplitude `magnitude` and period `period` from `start`.
+    A magnitude of 0.3 scales the features by up to 1.3.
+    """
+
+    KINDS = ('none', 'gradual', 'sudden', 'seasonal')
+
+    def __init__(self, kind='none', features=('glucose',), magnitude=0.3, start=0, duration=10000, period=1000):
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown drift profile {kind!r}; expected one of {', '.join(self.KINDS)}")
+        unknown = [f for f in features if f not in FEATURES]
+        if unknown:
+            raise ValueError(f"unknown drift features: {', '.join(unknown)}")
+        self.kind = kind
+        self.features = list(features)
+        self.magnitude = magnitude
+        self.start = start
+        self.duration = max(duration, 1)
+        self.period = max(period, 1)
+
+    def factor(self, steps):
+        t = np.asarray(steps, dtype=float) - self.start
+        if self.kind == 'sudden':
+            return np.where(t >= 0, self.magnitude, 0.0)
+        if self.kind == 'gradual':
+            return self.magnitude * np.clip(t / self.duration, 0.0, 1.0)
+        if self.kind == 'seasonal':
+            return np.where(t >= 0, self.magnitude * np.sin(2 * np.pi * t / self.period), 0.0)
+        return np.zeros_like(t)
+
+    def apply(self, x, columns, steps):
+        idx = [columns.index(f) for f in self.features if f in columns]
+        if self.kind != 'none' and idx:
+            x[:, idx] *= 1.0 + self.factor(steps)[:, None]
+        return x
+
+
+class RecordGenerator:
+    """Synthetic records drawn N at a time with NumPy.
+
+    Rows are resampled from the source data (or drawn uniformly from
+    RANDOM_RANGES without one), numeric features get multiplicative noise,
+    the drift profile is applied by record index, and categoricals are
+    rounded to integer codes. String categoricals in the source are
+    encoded in sorted order, as the training pipeline's encoder does. A
+    fixed seed reproduces the same stream, drift included.
+    """
+
+    def __init__(self, df=None, drift=None, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.drift = drift or DriftProfile()
+        self.columns = FEATURES if df is None else [c for c in FEATURES if c in df.columns]
+        self.categorical = np.array([c in CATEGORICAL for c in self.columns])
+        self.base = None if df is None else self._encode(df[self.columns])
+        self.step = 0
+
+    @staticmethod
+    def _encode(df):
+        cols = []
+        for c in df.columns:
+            col = df[c]
+            if not pd.api.types.is_numeric_dtype(col):
+                col = pd.Series(pd.Categorical(col.astype(str)).codes, index=col.index)
+            cols.append(col.to_numpy(dtype=float))
+        x = np.column_stack(cols)
+        return x[~np.isnan(x).any(axis=1)]
+
+    def _random(self, n):
+        x = np.empty((n, len(self.columns)))
+        for j, c in enumerate(self.columns):
+            if c in CATEGORICAL:
+                x[:, j] = self.rng.integers(0, 2, n)
+            else:
+                x[:, j] = self.rng.uniform(*RANDOM_RANGES[c], n)
+        return x
+
+    def block(self, n):
+        """Next n records as an (n, len(columns)) float array."""
+        if self.base is not None:
+            x = self.base[self.rng.integers(0, len(self.base), n)]
+        else:
+            x = self._random(n)
+        noise = (self.rng.random(x.shape) - 0.5) * NOISE * (np.abs(x) + 1)
+        x = x + np.where(self.categorical, 0.0, noise)
+        x = self.drift.apply(x, self.columns, np.arange(self.step, self.step + n))
+        self.step += n
+        x[:, self.categorical] = np.clip(np.rint(x[:, self.categorical]), 0, None)
+        return x
+
+    def frame(self, n):
+        df = pd.DataFrame(self.block(n), columns=self.columns)
+        cats = [c for c in self.columns if c in CATEGORICAL]
+        df[cats] = df[cats].astype(int)
+        return df
+
+    def records(self, n):
+        return self.frame(n).to_dict(orient='records')
+
+    def stream(self, block_size=BLOCK_SIZE):
+        """Endless iterator of records, generated a block at a time."""
+        while True:
+            yield from self.records(block_size)
+
+
+def drift_from_args(args):
+    features = [f.strip() for f in args.drift_features.split(',') if f.strip()]
+    return DriftProfile(args.drift, features, args.drift_magnitude, args.drift_start,
+                        args.drift_duration, args.drift_period)
+
+
+def stream(args):
+    """Send records to the backend every --interval seconds, singly or as /predict/batch bodies."""
+    gen = RecordGenerator(load_source(), drift_from_args(args), args.seed)
+    base = args.url.rstrip('/')
+    url = f"{base}/predict/batch" if args.batch_size > 0 else f"{base}/predict"
+    records = gen.stream()
+    with requests.Session() as session:
+        while True:
+            body = [next(records) for _ in range(args.batch_size)] if args.batch_size > 0 else next(records)
             try:
-                row[cat] = int(round(float(row[cat])))
-            except Exception:
-                row[cat] = 0
-    return row
+                resp = session.post(url, json=body, timeout=5)
+                if resp.status_code != 200:
+                    print(f"POST {url} returned {resp.status_code}: {resp.text[:200]}")
+            except Exception as exc:
+                print(f"POST {url} failed: {exc}")
+            if args.interval > 0:
+                time.sleep(args.interval)
 
 
-def main():
-    df = load_source()
-    url = f"{BACKEND.rstrip('/')}/predict"
-    while True:
+def generate(args):
+    """Write --rows records to a .csv, .jsonl or .parquet file, one block at a time."""
+    gen = RecordGenerator(load_source(), drift_from_args(args), args.seed)
+    ext = os.path.splitext(args.output)[1].lower()
+    if ext not in ('.csv', '.jsonl', '.parquet'):
+        raise SystemExit(f"unsupported output format {ext!r}; use .csv, .jsonl or .parquet")
+    if ext == '.parquet':
         try:
-            if df is not None:
-                rec = sample_record(df)
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("writing .parquet needs pyarrow (pip install pyarrow)")
+    writer = None
+    started = time.perf_counter()
+    written = 0
+    with open(args.output, 'wb') as f:
+        while written < args.rows:
+            df = gen.frame(min(args.block_size, args.rows - written))
+            if ext == '.csv':
+                df.to_csv(f, index=False, header=written == 0)
+            elif ext == '.jsonl':
+                df.to_json(f, orient='records', lines=True)
             else:
-                # fallback random generator
-                rec = {
-                    'age': random.randint(18, 80),
-                    'gender': random.choice([0,1]),
-                    'pulse_rate': random.randint(50, 110),
-                    'systolic_bp': random.randint(90, 160),
-                    'diastolic_bp': random.randint(60, 100),
-                    'glucose': random.uniform(70, 200),
-                    'height': random.uniform(150, 190),
-                    'weight': random.uniform(50, 120),
-                    'bmi': random.uniform(18, 40),
-                    'family_diabetes': random.choice([0,1]),
-                    'hypertensive': random.choice([0,1]),
-                    'family_hypertension': random.choice([0,1]),
-                    'cardiovascular_disease': random.choice([0,1]),
-                    'stroke': random.choice([0,1])
-                }
-
-            requests.post(url, json=rec, timeout=5)
-        except Exception:
-            pass
-        time.sleep(INTERVAL)
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(f, table.schema)
+                writer.write_table(table)
+            written += len(df)
+        if writer is not None:
+            writer.close()
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written} records to {args.output} in {elapsed:.2f}s ({written / elapsed:,.0f} records/s)")
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# load testing
+
+# latency histogram bounds in ms, log spaced from 0.1 ms to ~30 s
+HIST_BOUNDS_MS = np.round(np.geomspace(0.1, 30000, 34), 3)
+# absolute increase in error rate tolerated by --baseline comparisons
+ERROR_RATE_SLACK = 0.01
+
+
+def build_payloads(gen, n, batch_size):
+    """Generate n request bodies in one go, so sampling cost is amortized over n requests."""
+    if batch_size <= 0:
+        return gen.records(n)
+    records = gen.records(n * batch_size)
+    return [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+
+
+class Payloads:
+    """A fresh request body for every request, generated `block` bodies at a time.
+
+    Replaying a fixed pool would let the server's prediction cache answer
+    nearly every request after the first pass, and the benchmark would
+    measure the cache instead of the model.
+    """
+
+    def __init__(self, gen, block, batch_size):
+        self.gen = gen
+        self.block = max(1, block)
+        self.batch_size = batch_size
+        self._bodies = iter(())
+
+    def next(self):
+        body = next(self._bodies, None)
+        if body is None:
+            self._bodies = iter(build_payloads(self.gen, self.block, self.batch_size))
+            body = next(self._bodies)
+        return body
+
+
+class Results:
+    def __init__(self):
+        self.latencies_ms = []
+        self.statuses = {}
+        self.errors = {}
+        self.rows = 0
+
+    def record(self, latency_s, status=None, error=None, rows=0):
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+            return
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == 200:
+            self.latencies_ms.append(latency_s * 1000.0)
+            self.rows += rows
+
+    def summary(self, elapsed_s):
+        lat = np.asarray(self.latencies_ms)
+        ok = len(lat)
+        failed = sum(n for s, n in self.statuses.items() if s != 200) + sum(self.errors.values())
+        total = ok + failed
+        counts, _ = np.histogram(lat, bins=np.concatenate([[0.0], HIST_BOUNDS_MS, [np.inf]]))
+        pct = (lambda q: float(np.percentile(lat, q))) if ok else (lambda q: None)
+        return {
+            "requests": total,
+            "ok": ok,
+            "errors": failed,
+            "error_rate": failed / total if total else 0.0,
+            "status_codes": {str(k): v for k, v in sorted(self.statuses.items())},
+            "exceptions": self.errors,
+            "elapsed_s": elapsed_s,
+            "throughput_rps": ok / elapsed_s if elapsed_s else 0.0,
+            "rows_per_s": self.rows / elapsed_s if elapsed_s else 0.0,
+            "latency_ms": {
+                "mean": float(lat.mean()) if ok else None,
+                "p50": pct(50),
+                "p95": pct(95),
+                "p99": pct(99),
+                "max": float(lat.max()) if ok else None,
+            },
+            "histogram_ms": {
+                "le": [float(b) for b in HIST_BOUNDS_MS] + ["+Inf"],
+                "counts": counts.tolist(),
+            },
+        }
+
+
+async def send(client, url, body, rows, results, intended, measuring):
+    """POST one body; latency is measured from `intended`, the time it should have gone out."""
+    try:
+        resp = await client.post(url, json=body)
+        status, error = resp.status_code, None
+    except httpx.HTTPError as exc:
+        status, error = None, type(exc).__name__
+    if measuring():
+        results.record(time.perf_counter() - intended, status, error, rows)
+
+
+async def closed_loop(client, url, payloads, rows, results, args, deadline, measuring):
+    """`concurrency` users, each sending its next request as soon as the last one returns."""
+    async def user():
+        while time.perf_counter() < deadline:
+            await send(client, url, payloads.next(), rows, results, time.perf_counter(), measuring)
+    await asyncio.gather(*(user() for _ in range(args.concurrency)))
+
+
+async def open_loop(client, url, payloads, rows, results, args, deadline, measuring):
+    """Requests start at a fixed rate whatever the server does.
+
+    Latency counts from each request's scheduled start, so a server that
+    falls behind shows up as queueing delay rather than as a lower rate
+    (no coordinated omission).
+    """
+    interval = 1.0 / args.rate
+    start = time.perf_counter()
+    tasks = set()
+    i = 0
+    while True:
+        intended = start + i * interval
+        if intended >= deadline:
+            break
+        delay = intended - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(send(client, url, payloads.next(), rows, results, intended, measuring))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        i += 1
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def run_benchmark(args):
+    base = args.url.rstrip('/')
+    url = f"{base}/predict/batch" if args.batch_size > 0 else f"{base}/predict"
+    rows = max(args.batch_size, 1)
+    gen = RecordGenerator(load_source(), drift_from_args(args), args.seed)
+    payloads = Payloads(gen, args.payloads, args.batch_size)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = Results()
+
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        try:
+            health = (await client.get(f"{base}/health")).json()
+        except (httpx.HTTPError, ValueError):
+            health = None
+        started = time.perf_counter()
+        measure_from = started + args.warmup
+        deadline = measure_from + args.duration
+        measuring = lambda: time.perf_counter() >= measure_from
+        run = open_loop if args.mode == "open" else closed_loop
+        await run(client, url, payloads, rows, results, args, deadline, measuring)
+        elapsed = time.perf_counter() - measure_from
+
+    return {
+        "started_at": datetime.utcnow().isoformat(),
+        "config": {
+            "url": url,
+            "mode": args.mode,
+            "rate": args.rate if args.mode == "open" else None,
+            "concurrency": args.concurrency,
+            "batch_size": args.batch_size,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+        },
+        "server": health,
+        "results": results.summary(elapsed),
+    }
+
+
+def compare(result, baseline, tolerance):
+    """Regressions of result against a saved baseline run, as human-readable strings."""
+    cur, base = result["results"], baseline["results"]
+    problems = []
+    for q in ("p50", "p95", "p99"):
+        c, b = cur["latency_ms"][q], base["latency_ms"][q]
+        if c is not None and b and c > b * (1 + tolerance):
+            problems.append(f"{q} latency {c:.2f} ms vs baseline {b:.2f} ms")
+    if base["throughput_rps"] and cur["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+        problems.append(f"throughput {cur['throughput_rps']:.1f} rps vs baseline {base['throughput_rps']:.1f} rps")
+    if cur["error_rate"] > base["error_rate"] + ERROR_RATE_SLACK:
+        problems.append(f"error rate {cur['error_rate']:.2%} vs baseline {base['error_rate']:.2%}")
+    return problems
+
+
+def print_summary(result):
+    r = result["results"]
+    lat = r["latency_ms"]
+    print(f"{result['config']['mode']}-loop {result['config']['url']}: "
+          f"{r['requests']} requests in {r['elapsed_s']:.1f}s, {r['throughput_rps']:.1f} rps "
+          f"({r['rows_per_s']:.1f} rows/s), error rate {r['error_rate']:.2%}")
+    if lat["p50"] is not None:
+        print(f"latency ms: p50 {lat['p50']:.2f}  p95 {lat['p95']:.2f}  p99 {lat['p99']:.2f}  max {lat['max']:.2f}")
+
+
+def bench(args):
+    result = asyncio.run(run_benchmark(args))
+    print_summary(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(result, json.load(f), args.tolerance)
+        for p in problems:
+            print(f"REGRESSION: {p}")
+        return 1 if problems else 0
+    return 0
+
+
+def main(argv=None):
+    gen_args = argparse.ArgumentParser(add_help=False)
+    gen_args.add_argument("--seed", type=int, default=None, help="fix the record stream for reproducible runs")
+    gen_args.add_argument("--drift", choices=DriftProfile.KINDS, default=os.environ.get("GEN_DRIFT", "none"))
+    gen_args.add_argument("--drift-features", default=os.environ.get("GEN_DRIFT_FEATURES", "glucose"),
+                          help="comma-separated features to shift")
+    gen_args.add_argument("--drift-magnitude", type=float, default=float(os.environ.get("GEN_DRIFT_MAGNITUDE", "0.3")),
+                          help="relative shift, e.g. 0.3 scales features by up to 1.3")
+    gen_args.add_argument("--drift-start", type=int, default=int(os.environ.get("GEN_DRIFT_START", "0")),
+                          help="record index at which drift begins")
+    gen_args.add_argument("--drift-duration", type=int, default=int(os.environ.get("GEN_DRIFT_DURATION", "10000")),
+                          help="records over which gradual drift ramps up")
+    gen_args.add_argument("--drift-period", type=int, default=int(os.environ.get("GEN_DRIFT_PERIOD", "1000")),
+                          help="records per cycle of seasonal drift")
+
+    parser = argparse.ArgumentParser(description="Synthetic traffic and load testing for the prediction API.")
+    sub = parser.add_subparsers(dest="command")
+    st = sub.add_parser("stream", parents=[gen_args], help="send records to the backend at a steady pace (default)")
+    st.add_argument("--url", default=BACKEND)
+    st.add_argument("--interval", type=float, default=INTERVAL, help="seconds between requests")
+    st.add_argument("--batch-size", type=int, default=0, help="records per request; > 0 uses /predict/batch")
+    g = sub.add_parser("generate", parents=[gen_args], help="write a synthetic dataset to a file")
+    g.add_argument("output", help="destination .csv, .jsonl or .parquet file")
+    g.add_argument("--rows", type=int, default=100000)
+    g.add_argument("--block-size", type=int, default=BLOCK_SIZE * 64)
+    b = sub.add_parser("bench", parents=[gen_args], help="load test /predict and report latency and throughput")
+    b.add_argument("--url", default=BACKEND)
+    b.add_argument("--mode", choices=["closed", "open"], default="closed",
+                   help="closed: fixed number of concurrent users; open: fixed arrival rate")
+    b.add_argument("--concurrency", type=int, default=32, help="users (closed) or max connections (open)")
+    b.add_argument("--rate", type=float, default=100.0, help="requests per second in open-loop mode")
+    b.add_argument("--batch-size", type=int, default=0, help="records per request; > 0 uses /predict/batch")
+    b.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    b.add_argument("--warmup", type=float, default=5.0, help="seconds of load before measuring")
+    b.add_argument("--timeout", type=float, default=10.0)
+    b.add_argument("--payloads", type=int, default=1000, help="request bodies generated per refill; every request still gets a fresh body, "
+                        "so the server's prediction cache does not inflate the results")
+    b.add_argument("--output", help="write JSON results here")
+    b.add_argument("--baseline", help="JSON results of an earlier run; exit 1 on regression")
+    b.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression vs the baseline")
+    argv = sys.argv[1:] if argv is None else argv
+    args = parser.parse_args(argv or ["stream"])
+    if args.command == "bench":
+        return bench(args)
+    if args.command == "generate":
+        return generate(args)
+    stream(args)
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
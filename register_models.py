@@ -2,7 +2,15 @@
 Register all trained models to Comet ML Model Registry
 """
 import os
-from comet_ml import Experiment, API
+import sys
+
+try:
+    from comet_ml import API
+except Exception:
+    API = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from tracking import Tracker, get_backend
 
 COMET_API_KEY = os.getenv("COMET_API_KEY", "XDQssBc8ND37JyE1L2HfvZwUW")
 WORKSPACE = "nerar6806"
@@ -35,6 +43,8 @@ def register_all_models():
     print(f"Project: {PROJECT_NAME}")
     print()
 
+    # runs spool locally and upload in the background, falling back to ./tracking if Comet is down
+    tracker = Tracker(backend=get_backend(COMET_API_KEY, WORKSPACE))
     for model_info in MODELS:
         model_name = model_info["name"]
         model_file = model_info["file"]
@@ -51,19 +61,12 @@ def register_all_models():
             continue
 
         try:
-            experiment = Experiment(
-                api_key=COMET_API_KEY,
-                project_name=PROJECT_NAME,
-                workspace=WORKSPACE
-            )
+            experiment = tracker.start_run(model_name, project=PROJECT_NAME)
 
             experiment.log_parameters(params)
             experiment.log_metrics(metrics)
 
-            experiment.log_model(
-                name=model_name,
-                file_or_folder=model_file
-            )
+            experiment.log_model(model_name, model_file)
 
             experiment.register_model(
                 model_name=model_name,
@@ -72,18 +75,22 @@ def register_all_models():
             )
 
             experiment.end()
-            print(f"  SUCCESS: {model_name}:v1.0.0 registered!")
+            print(f"  SUCCESS: {model_name}:v1.0.0 queued for registration")
 
         except Exception as e:
             print(f"  ERROR: {e}")
 
     print(f"\n{'='*50}")
-    print("All models registered!")
+    left = tracker.close()
+    print("All models registered!" if not left else "Some uploads are still spooled; see above")
     print(f"\nView at: https://www.comet.com/{WORKSPACE}/{PROJECT_NAME}")
     print(f"Models: https://www.comet.com/{WORKSPACE}/models")
 
 def verify_registration():
     print("\nVerifying registration...")
+    if API is None:
+        print("comet_ml not installed; skipping verification")
+        return
     try:
         api = API(api_key=COMET_API_KEY)
         for model_info in MODELS:
@@ -1,27 +1,30 @@
 """
 Complete Training Pipeline - Retrain all models and register to Comet ML
 """
+import argparse
 import os
+import sys
 os.environ["COMET_API_KEY"] = os.getenv("COMET_API_KEY", "XDQssBc8ND37JyE1L2HfvZwUW")
 
-import comet_ml
-
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.svm import SVC
-from sklearn.metrics import (
-    accuracy_score, precision_score, recall_score, f1_score,
-    confusion_matrix, ConfusionMatrixDisplay, roc_curve, auc
-)
-from comet_ml import Experiment, API
+from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay, roc_curve, auc
 import joblib
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from fast_scorer import save_scorer, SCORER_SUFFIX
+from preprocessing import serving_pipeline
+from load_from_registry import artifact_version
+from train_engine import StageTimer, fit_candidates, prepare
+from search import search
+from tracking import Tracker, get_backend
+from evaluation import CALIBRATION_METHODS, CALIBRATION_SIZE, calibrate, evaluate, needs_calibration
+
 WORKSPACE = "nerar6806"
 PROJECT_NAME = "mlops"
 DATA_FILE = "Diabetes_Final_Data_V2.csv"
@@ -41,27 +44,53 @@ def load_and_preprocess_data():
     
     return X, y
 
-def train_models(X_train, X_test, y_train, y_test):
-    models = {}
-    
-    print("\n--- Training Logistic Regression ---")
-    lr = LogisticRegression(solver='liblinear', class_weight='balanced', max_iter=1000)
-    lr.fit(X_train, y_train)
-    models['LogisticRegression'] = lr
-    print("LR trained")
-    
-    print("\n--- Training Random Forest ---")
-    rf = RandomForestClassifier(n_estimators=200, max_depth=10, random_state=42)
-    rf.fit(X_train, y_train)
-    models['RandomForest'] = rf
-    print("RF trained")
-    
-    print("\n--- Training SVM ---")
-    svm = SVC(kernel='rbf', class_weight='balanced', probability=True, random_state=42)
-    svm.fit(X_train, y_train)
-    models['SVM'] = svm
-    print("SVM trained")
-    
+def candidate_models():
+    return {
+        'LogisticRegression': LogisticRegression(solver='liblinear', class_weight='balanced', max_iter=1000),
+        'RandomForest': RandomForestClassifier(n_estimators=200, max_depth=10, random_state=42),
+        # probabilities come from calibrate_models, not SVC's internal 5-fold Platt scaling
+        'SVM': SVC(kernel='rbf', class_weight='balanced', random_state=42),
+    }
+
+def tune_models(data_path, tracker, timer=None):
+    """Successive-halving search over every candidate; each trial is logged as its own experiment.
+
+    Trials go through the tracker's spool, so logging them never waits on
+    Comet. Returns the best parameters per model and the name of the model
+    with the best cross-validated score at the search's highest complete
+    rung (None when no trial finished).
+    """
+    print("\n--- Searching hyperparameters ---")
+    result = search(candidate_models(), data_path, timer=timer)
+    for trial in result['trials']:
+        if not trial['scores']:
+            continue
+        run = tracker.start_run(f"search-{trial['model']}-{trial['trial']}", project=PROJECT_NAME)
+        run.log_parameters(trial['params'])
+        for rung, (score, fraction) in enumerate(zip(trial['scores'], trial['fractions'])):
+            run.log_metrics({f"cv_{result['metric']}": score, 'train_fraction': fraction}, step=rung)
+        run.end()
+    return result['best'], result['winner']
+
+def train_models(data_path, timer=None, params=None, calibration='sigmoid'):
+    """Fit all candidates at once, one process each; RandomForest gets the spare cores.
+
+    `params` (name -> parameters, e.g. from tune_models) override the defaults.
+    Models that will be calibrated fit without the calibration rows.
+    """
+    print("\n--- Training LogisticRegression, RandomForest and SVM concurrently ---")
+    models = candidate_models()
+    for name, best in (params or {}).items():
+        models[name].set_params(**best)
+    holdout = [n for n, m in models.items() if needs_calibration(m)] if calibration != 'none' else []
+    return fit_candidates(models, data_path, timer=timer, holdout=holdout)
+
+def calibrate_models(models, X_calib, y_calib, method='sigmoid'):
+    """Calibrate every model without predict_proba on the held-out calibration rows."""
+    for name, model in models.items():
+        if needs_calibration(model):
+            print(f"Calibrating {name} ({method})...")
+            models[name] = calibrate(model, X_calib, y_calib, method)
     return models
 
 def evaluate_models(models, X_test, y_test, experiment):
@@ -69,24 +98,18 @@ def evaluate_models(models, X_test, y_test, experiment):
     
     for name, model in models.items():
         print(f"\nEvaluating {name}...")
-        y_pred = model.predict(X_test)
-        y_proba = model.predict_proba(X_test)[:, 1] if hasattr(model, 'predict_proba') else None
+        # one scoring pass per model; metrics and plots all reuse it
+        result = evaluate(model, X_test, y_test)
+        metrics = {k: result['metrics'][k] for k in ('accuracy', 'precision', 'recall', 'f1')}
         
-        metrics = {
-            'accuracy': accuracy_score(y_test, y_pred),
-            'precision': precision_score(y_test, y_pred),
-            'recall': recall_score(y_test, y_pred),
-            'f1': f1_score(y_test, y_pred)
-        }
-        
-        experiment.log_metrics(metrics, prefix=name)
+        experiment.log_metrics({f"{name}_{k}": v for k, v in metrics.items()})
         print(f"  {name} metrics: {metrics}")
         
         results[name] = {
             'model': model,
             'metrics': metrics,
-            'y_pred': y_pred,
-            'y_proba': y_proba
+            'y_pred': result['y_pred'],
+            'y_score': result['y_score']
         }
     
     return results
@@ -100,14 +123,14 @@ def save_confusion_matrix(y_true, y_pred, model_name, experiment):
     disp.plot(ax=ax, cmap='Blues')
     plt.title(f'Confusion Matrix - {model_name}')
     
-    experiment.log_figure(figure_name=f"{model_name}_confusion_matrix", figure=fig)
     plt.savefig(f"confusion_matrix_{model_name}.png", dpi=150, bbox_inches='tight')
     plt.close()
+    experiment.log_image(f"confusion_matrix_{model_name}.png", name=f"{model_name}_confusion_matrix")
     print(f"  Saved confusion_matrix_{model_name}.png")
 
-def save_roc_curve(y_true, y_proba, model_name, experiment):
+def save_roc_curve(y_true, y_score, model_name, experiment):
     print(f"Generating ROC curve for {model_name}...")
-    fpr, tpr, thresholds = roc_curve(y_true, y_proba)
+    fpr, tpr, thresholds = roc_curve(y_true, y_score)
     roc_auc = auc(fpr, tpr)
     
     fig, ax = plt.subplots(figsize=(8, 6))
@@ -120,15 +143,15 @@ def save_roc_curve(y_true, y_proba, model_name, experiment):
     ax.set_title(f'ROC Curve - {model_name}')
     ax.legend(loc="lower right")
     
-    experiment.log_figure(figure_name=f"{model_name}_roc_curve", figure=fig)
-    experiment.log_metric(f"{model_name}_auc", roc_auc)
     plt.savefig(f"roc_curve_{model_name}.png", dpi=150, bbox_inches='tight')
     plt.close()
+    experiment.log_image(f"roc_curve_{model_name}.png", name=f"{model_name}_roc_curve")
+    experiment.log_metrics({f"{model_name}_auc": roc_auc})
     print(f"  Saved roc_curve_{model_name}.png (AUC: {roc_auc:.3f})")
     
     return roc_auc
 
-def save_all_models(models, results):
+def save_all_models(models, results, experiment, scaler=None):
     print("\n--- Saving Models ---")
     
     model_configs = {
@@ -148,14 +171,21 @@ def save_all_models(models, results):
     
     for name, model in models.items():
         file_path = model_configs[name]['file']
-        joblib.dump(model, file_path)
+        # ship scaler + model as one artifact so serving scores raw features
+        pipeline = serving_pipeline(model, scaler)
+        joblib.dump(pipeline, file_path)
         print(f"  Saved {file_path}")
+
+        scorer_path = f"{name}{SCORER_SUFFIX}"
+        if save_scorer(pipeline, scorer_path, artifact_version(file_path)):
+            print(f"  Saved {scorer_path}")
         
-        experiment.log_model(name=f"diabetes-{name.lower()}-model", file_or_folder=file_path)
+        experiment.log_model(f"diabetes-{name.lower()}-model", file_path)
     
     return model_configs
 
-def register_models(model_configs, results):
+def register_models(model_configs, results, experiment, winner=None):
+    """Register every model, or only `winner` (the search's best) when one is given."""
     print("\n--- Registering Models to Comet ML ---")
     
     model_names = {
@@ -165,6 +195,8 @@ def register_models(model_configs, results):
     }
     
     for name, config in model_configs.items():
+        if winner is not None and name != winner:
+            continue
         model_file = config['file']
         metrics = results[name]['metrics']
         comet_name = model_names[name]
@@ -183,47 +215,65 @@ def register_models(model_configs, results):
             print(f"    Registration note: {e}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Retrain all models and register them to Comet ML.")
+    parser.add_argument("--search", action="store_true",
+                        help="tune hyperparameters by successive halving first and register only the best model "
+                             "(budget: TRAIN_SEARCH_BUDGET_S)")
+    parser.add_argument("--calibration", choices=CALIBRATION_METHODS, default="sigmoid",
+                        help="post-hoc probability calibration for models without predict_proba (the SVM), "
+                             "fitted on TRAIN_CALIBRATION_SIZE of the training split that only the SVM gives up")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("  MLOps Model Retraining Pipeline")
     print("  Workspace: nerar6806 | Project: mlops")
     print("=" * 60)
     
-    experiment = Experiment(
-        api_key=os.getenv("COMET_API_KEY", "XDQssBc8ND37JyE1L2HfvZwUW"),
-        project_name=PROJECT_NAME,
-        workspace=WORKSPACE
-    )
-    
-    experiment.set_name(f"retraining-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    # every log call only spools to disk; the tracker uploads in the background,
+    # so a slow or unreachable Comet never stalls (or fails) the retrain
+    tracker = Tracker(get_backend(workspace=WORKSPACE))
+    experiment = tracker.start_run(f"retraining-{datetime.now().strftime('%Y%m%d-%H%M%S')}", project=PROJECT_NAME)
     
-    X, y = load_and_preprocess_data()
+    timer = StageTimer()
+    with timer.stage("load"):
+        X, y = load_and_preprocess_data()
     
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
+    # split + scale, cached on disk by data hash
+    data, data_path = prepare(
+        pd.concat([X, y], axis=1), "Outcome", test_size=0.2, seed=42, stratify=True,
+        calibration_size=CALIBRATION_SIZE if args.calibration != "none" else 0.0, timer=timer
     )
-    
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+    scaler = data['scaler']
+    X_test_scaled, y_test = data['X_test'], data['y_test']
     
     joblib.dump(scaler, 'scaler.pkl')
     experiment.log_model("scaler", "scaler.pkl")
     print("\nSaved and logged scaler.pkl")
     
-    models = train_models(X_train_scaled, X_test_scaled, y_train, y_test)
+    params, winner = None, None
+    if args.search:
+        params, winner = tune_models(data_path, tracker, timer)
+    models = train_models(data_path, timer, params, args.calibration)
+    if args.calibration != "none":
+        with timer.stage("calibrate"):
+            models = calibrate_models(models, data['X_calib'], data['y_calib'], args.calibration)
     
-    results = evaluate_models(models, X_test_scaled, y_test, experiment)
+    with timer.stage("evaluate"):
+        results = evaluate_models(models, X_test_scaled, y_test, experiment)
     
     print("\n--- Generating Visualizations ---")
-    for name, result in results.items():
-        save_confusion_matrix(y_test, result['y_pred'], name, experiment)
-        if result['y_proba'] is not None:
-            save_roc_curve(y_test, result['y_proba'], name, experiment)
+    with timer.stage("plots"):
+        for name, result in results.items():
+            save_confusion_matrix(y_test, result['y_pred'], name, experiment)
+            save_roc_curve(y_test, result['y_score'], name, experiment)
     
-    save_all_models(models, results)
-    register_models({'LogisticRegression': models['LogisticRegression'], 'RandomForest': models['RandomForest'], 'SVM': models['SVM']}, results)
+    with timer.stage("save"):
+        model_configs = save_all_models(models, results, experiment, scaler)
+    register_models(model_configs, results, experiment, winner)
     
     experiment.end()
+    with timer.stage("tracking upload"):
+        tracker.close()
     
     print("\n" + "=" * 60)
     print("  Training Complete!")
@@ -236,12 +286,14 @@ def main():
     print(f"\nView experiments: https://www.comet.com/{WORKSPACE}/{PROJECT_NAME}")
     print(f"View models: https://www.comet.com/{WORKSPACE}/models")
     print("\nGenerated files:")
-    print("  - LogisticRegression.pkl")
-    print("  - RandomForest.pkl")
-    print("  - SVM.pkl")
+    print("  - LogisticRegression.pkl  (scaler + model pipeline)")
+    print("  - RandomForest.pkl        (scaler + model pipeline)")
+    print("  - SVM.pkl                 (scaler + model pipeline)")
     print("  - scaler.pkl")
+    print(f"  - LogisticRegression{SCORER_SUFFIX}, RandomForest{SCORER_SUFFIX}")
     print("  - confusion_matrix_*.png (3 files)")
     print("  - roc_curve_*.png (3 files)")
+    timer.report()
 
 if __name__ == "__main__":
     main()